@@ -1,10 +1,19 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime
 from streamlit_gsheets import GSheetsConnection
 import streamlit.components.v1 as components
+from functools import partial
+from network_data import (
+    LOCAL_DATA_DIR, PERF_PANEL, SHARED_DIR, SNAPSHOT_DIR, AggregateCache, LocalFileConnection,
+    NetworkDataStore, SharedNetworkStore, StageMetrics, StageTimer, align_mask, build_network_model,
+    fetch_sheets, filter_key, filter_mask, kpi_means, local_sheet_links, sheet_links_from_secrets,
+    site_details
+)
+from network_charts import create_advanced_chart
 
 
 # --- LOGIN FUNCTION (Improved Logic, Same UI) ---
@@ -131,38 +140,82 @@ st.markdown("""
     """, unsafe_allow_html=True)
 
 # 3. OPTIMIZED GOOGLE SHEETS CONNECTION
-conn = st.connection("gsheets", type=GSheetsConnection)
-
-@st.cache_data(ttl="15m")
-def load_all_network_data():
-    sheet_links = {
-        "SITE_AVAIL": st.secrets["connections"]["gsheets"]["url_site"],
-        "AVAILABILITY": st.secrets["connections"]["gsheets"]["url_avail"],
-        "2G": st.secrets["connections"]["gsheets"]["url_2g"],
-        "3G": st.secrets["connections"]["gsheets"]["url_3g"],
-        "4G": st.secrets["connections"]["gsheets"]["url_4g"]
-    }
-    
-    loaded_tech_dfs = {}
-    for name, link in sheet_links.items():
-        temp_df = conn.read(spreadsheet=link, ttl=0)
-        temp_df.columns = [str(c).strip().upper() for c in temp_df.columns]
-        loaded_tech_dfs[name] = temp_df
-    return loaded_tech_dfs
+# (not opened in offline mode, which reads local exports instead - see below)
+conn = None if LOCAL_DATA_DIR else st.connection("gsheets", type=GSheetsConnection)
+
+REFRESH_INTERVAL = 15 * 60  # seconds between background reloads of the sheets
+
+@st.cache_resource
+def stage_metrics():
+    # Per-process stage timings of reruns and background refreshes
+    return StageMetrics()
+
+# Times this rerun's stages; recorded at the end of the script
+timer = StageTimer()
+
+@st.cache_resource
+def network_store():
+    # One per process. It serves the local snapshot straight away, and a
+    # background thread reloads the sheets every REFRESH_INTERVAL and swaps the
+    # new version in, so no rerun ever waits on Google Sheets (except the very
+    # first one on a fresh deploy, which has no snapshot yet)
+    def fetch_live_network_data(held_dfs):
+        sheet_links = sheet_links_from_secrets(st.secrets["connections"]["gsheets"])
+
+        # All five tabs are read at once, so a refresh waits for the slowest tab only.
+        # Tabs we already hold only have their new day columns parsed and merged in.
+        return fetch_sheets(conn, sheet_links, held=held_dfs)
+
+    # Offline mode (NETWORK_DATA_DIR=./exports): same pipeline over local
+    # CSV / XLSX / Parquet exports of the tabs, no Google credentials needed
+    def fetch_local_network_data(held_dfs):
+        return fetch_sheets(LocalFileConnection(), local_sheet_links(LOCAL_DATA_DIR), held=held_dfs)
+
+    fetch = fetch_local_network_data if LOCAL_DATA_DIR else fetch_live_network_data
+
+    # Typed metadata + float32 KPI matrix per tab are built with each version,
+    # also off the request path, and shared by every session (read-only).
+    # Only the hot columns (SID, filters, last 30 days, TCH%) are kept in
+    # memory; site details, FUEL and older days are read from the snapshot
+    # when first asked for, and the raw tabs aren't held at all
+    store = NetworkDataStore(
+        fetch, prepare=partial(build_network_model, snapshot_dir=SNAPSHOT_DIR),
+        interval=REFRESH_INTERVAL, metrics=stage_metrics(), keep_raw=False
+    )
+
+    # Several replicas on one host (NETWORK_SHARED_DIR=/dev/shm/...): one leader
+    # talks to Google Sheets and the others map its published data
+    if SHARED_DIR:
+        return SharedNetworkStore(store, SHARED_DIR).start()
+    return store.start()
+
+@st.cache_resource
+def aggregate_cache():
+    # One per process, so sessions reuse each other's computed averages
+    return AggregateCache(maxsize=512)
+
+VIEW_CACHE_SIZE = 4  # filtered views kept per session
+
+def session_view_cache():
+    # Per session (not shared): the last few filtered views, so reruns that
+    # only switch tab or Display Range skip the filtering stage
+    if "view_cache" not in st.session_state:
+        st.session_state["view_cache"] = AggregateCache(maxsize=VIEW_CACHE_SIZE)
+    return st.session_state["view_cache"]
 
 try:
-    tech_dfs = load_all_network_data()
-    df = tech_dfs.get("AVAILABILITY")
+    with timer.stage("data"):
+        network_data = network_store().current(timeout=120)
     
     # --- UPDATED BUTTON LOGIC ---
     if st.sidebar.button("Clear Filters", use_container_width=True):
         # REMOVED: st.cache_data.clear() <- This was causing the slow reload
         
         # We only clear the UI selections
-        keys_to_reset = ["sid_filter", "region_filter", "tgl_filter", "usf_filter", "rev_filter", "date_filter"]
+        keys_to_reset = ["sid_filter", "sid_query", "region_filter", "tgl_filter", "usf_filter", "rev_filter", "date_filter"]
         for key in keys_to_reset:
             if key in st.session_state:
-                st.session_state[key] = "All Sites" if key == "sid_filter" else []
+                st.session_state[key] = {"sid_filter": "All Sites", "sid_query": ""}.get(key, [])
         
         # Rerun to apply the UI changes using the data ALREADY in memory
         st.rerun()
@@ -172,35 +225,49 @@ except Exception as e:
     st.stop()
 
 try:
-    # Call the cached function
-    tech_dfs = load_all_network_data()
+    # Latest complete version from the background refresher
+    tab_versions = network_data.versions
+    tech_models = network_data.models
     
-    # Assign your main dataframe for filters
-    df = tech_dfs.get("AVAILABILITY")
+    # Assign your main dataframe for filters (hot site metadata of AVAILABILITY;
+    # the KPI columns live in avail_model.kpi, the rest on disk)
+    avail_model = tech_models["AVAILABILITY"]
+    df = avail_model.meta
     
-    st.sidebar.success("Connected to Live Data")
+    # A failing background refresh keeps serving the last good version; say so
+    refresh_error = network_store().last_error
+    if refresh_error:
+        age_minutes = (datetime.now() - datetime.fromtimestamp(network_data.loaded_at)).total_seconds() / 60
+        age = f"{age_minutes / 60:.1f} h" if age_minutes >= 90 else f"{age_minutes:.0f} min"
+        st.sidebar.error(f"Live refresh failing, showing data from {age} ago: {refresh_error}")
+    else:
+        st.sidebar.success("Connected to Live Data")
+    st.sidebar.caption(f"Data as of {datetime.fromtimestamp(network_data.loaded_at):%d %b %H:%M}")
+    for tab_name, tab_error in network_data.errors.items():
+        st.sidebar.warning(f"{tab_name} not refreshed: {tab_error}")
 
 except Exception as e:
     st.error(f"⚠️ Error loading data: {e}")
     st.stop()
 
-# 4. DATA PROCESSING
-date_cols = [col for col in df.columns if '-' in col and col[0].isdigit()]
-tch_cols = [col for col in df.columns if 'TCH%' in col]
-fuel_cols = [col for col in df.columns if '(FUEL)' in col]
+# 4. DATA PROCESSING (column classes come from the schema built with the data)
+schema = avail_model.schema
+date_cols = schema.date_cols
+tch_cols = schema.tch_cols
+fuel_cols = schema.fuel_cols
 
 latest_date_col = date_cols[-1] if date_cols else None
 latest_tch_col = tch_cols[-1] if tch_cols else None
 
 if latest_date_col:
-    try:
-        display_date = datetime.strptime(latest_date_col, '%Y-%m-%d').strftime("%d %B %Y")
-    except:
-        display_date = latest_date_col
+    latest_day = pd.Timestamp(schema.dates[-1])
+    display_date = latest_day.strftime("%d %B %Y") if not pd.isna(latest_day) else latest_date_col
 else:
     display_date = datetime.now().strftime("%d %B %Y")
 
 # 5. SIDEBAR FILTERS
+SID_MATCHES = 50  # Station IDs listed under the search box
+
 st.sidebar.header("🛠️ Dashboard Filters")
 # --- NEW DATE FILTER ---
 selected_date = st.sidebar.selectbox(
@@ -208,120 +275,86 @@ selected_date = st.sidebar.selectbox(
     options=date_cols[::-1], # Reverses the list so the newest date is on top
     key="date_filter"
 )
-all_sids = ["All Sites"] + sorted(df['SID'].astype(str).unique().tolist())
-search_sid = st.sidebar.selectbox("Select Station ID", all_sids, key="sid_filter")
-sel_region = st.sidebar.multiselect("Region Filter", options=sorted(df['REGION'].dropna().unique()), key="region_filter")
-sel_tgl = st.sidebar.multiselect("TGL Filter", options=sorted(df['TGL'].dropna().unique()), key="tgl_filter")
+# Typeahead over the sorted SID index built with the data: only the top
+# matches go into the selectbox, not every site
+sid_query = st.sidebar.text_input("Search Station ID", key="sid_query", placeholder="Type part of a SID")
+sid_matches = avail_model.sids.search(sid_query, k=SID_MATCHES)
+current_sid = st.session_state.get("sid_filter", "All Sites")
+if current_sid != "All Sites" and current_sid not in sid_matches and current_sid in avail_model.sids.slots:
+    sid_matches.insert(0, current_sid)  # keep the picked site selectable while typing
+search_sid = st.sidebar.selectbox("Select Station ID", ["All Sites"] + sid_matches, key="sid_filter")
+# Option lists are built once per data version from the categorical columns
+filter_options = avail_model.index
+sel_region = st.sidebar.multiselect("Region Filter", options=filter_options.options_for("REGION"), key="region_filter")
+# TGL choices narrow to the selected regions; picks outside them are dropped
+tgl_options = filter_options.options_for("TGL", {"REGION": sel_region})
+if any(t not in tgl_options for t in st.session_state.get("tgl_filter", [])):
+    st.session_state["tgl_filter"] = [t for t in st.session_state["tgl_filter"] if t in tgl_options]
+sel_tgl = st.sidebar.multiselect("TGL Filter", options=tgl_options, key="tgl_filter")
 # sharing_status = st.sidebar.selectbox("Sharing Status", options=sorted(df['SHARING STATUS'].dropna().unique()), key="sh_filter")
 
 # --- NEW USF FILTER ---
-usf_options = sorted(df['NEW USF SITES'].dropna().unique()) if 'NEW USF SITES' in df.columns else []
+usf_options = filter_options.options_for("NEW USF SITES")
 sel_usf = st.sidebar.multiselect("New USF Sites Filter", options=usf_options, key="usf_filter")
 
 # --- REVENUE CAT FILTER ---
-rev_options = sorted(df['REVENUE CAT'].dropna().unique()) if 'REVENUE CAT' in df.columns else []
+rev_options = filter_options.options_for("REVENUE CAT")
 sel_rev = st.sidebar.multiselect("Revenue Category Filter", options=rev_options, key="rev_filter")
 
-# --- STEP 4 UPDATE: Add TCH Detection ---
-date_cols = [col for col in df.columns if '-' in col and col[0].isdigit()]
-# Search for the most recent TCH% column
-tch_cols = [col for col in df.columns if 'TCH%' in col]
-latest_date_col = date_cols[-1] if date_cols else None
-latest_tch_col = tch_cols[-1] if tch_cols else None
-
-filt_df = df.copy()
-filters_active = False
-
-if search_sid != "All Sites":
-    filt_df = filt_df[filt_df['SID'].astype(str) == search_sid]
-    filters_active = True
-if sel_region:
-    filt_df = filt_df[filt_df['REGION'].isin(sel_region)]
-    filters_active = True
-if sel_tgl:
-    filt_df = filt_df[filt_df['TGL'].isin(sel_tgl)]
-    filters_active = True
-if sel_usf:
-    filt_df = filt_df[filt_df['NEW USF SITES'].isin(sel_usf)]
-    filters_active = True
-# if sharing_status:
-#     filt_df = filt_df[filt_df['SHARING STATUS'].isin(sharing_status)]
-#     filters_active = True
-if sel_rev:
-    filt_df = filt_df[filt_df['REVENUE CAT'].isin(sel_rev)]
-    filters_active = True 
-# 6. CHART FUNCTION - FIXED PROPERTY PATHS
-def create_advanced_chart(x_data, y_data, title, color, y_label, is_percent=True):
-    x_clean = []
-    for x in x_data:
-        try:
-            x_clean.append(datetime.strptime(str(x), '%Y-%m-%d').strftime('%d-%b'))
-        except:
-            x_clean.append(str(x).replace(' TCH%', '').split(' (FUEL)')[0])
-
-    fig = go.Figure()
-
-    fig.add_trace(go.Scatter(
-        x=x_clean, 
-        y=y_data,
-        mode='lines+markers+text', 
-        text=[f"<b>{v:.2f}%</b>" if is_percent else f"<b>{v:.2f}</b>" for v in y_data], 
-        textposition="top center", 
-        textfont=dict(
-            family="Inter, sans-serif",
-            size=12,          
-            color="#000000"   
-        ),
-        cliponaxis=False, 
-        line=dict(width=4, color=color, shape='spline'), 
-        marker=dict(
-            size=10, 
-            color='white', 
-            line=dict(color=color, width=3)
-        ),
-        fill='tozeroy',
-        fillcolor=f'rgba{tuple(list(int(color.lstrip("#")[i:i+2], 16) for i in (0, 2, 4)) + [0.1])}',
-        hoverinfo="x+y"
-    ))
+# Sidebar selections, applied to the normalized model (categorical isin, no SID string casts)
+sid_choice = search_sid if search_sid != "All Sites" else None
+active_filters = {
+    "REGION": sel_region,
+    "TGL": sel_tgl,
+    "NEW USF SITES": sel_usf,
+    # "SHARING STATUS": sharing_status,
+    "REVENUE CAT": sel_rev,
+}
+filters_active = sid_choice is not None or any(active_filters.values())
+
+view_key = filter_key(sid_choice, active_filters)
+
+def compute_view():
+    # The filtered view is just which rows match (mask + positions); no
+    # DataFrame is copied, consumers read only the columns they need
+    view_mask = filter_mask(avail_model, sid_choice, active_filters)
+    view_positions = np.flatnonzero(view_mask)
+    view_mask.setflags(write=False)  # reused by later reruns of this session
+    view_positions.setflags(write=False)
+    return view_mask, view_positions
+
+with timer.stage("filter"):
+    # Same selections on the same data version as a recent rerun: reuse its rows
+    row_mask, row_positions = session_view_cache().get_or_compute(
+        (tab_versions.get("AVAILABILITY"), view_key), compute_view
+    )
 
-    fig.update_layout(
-        title=dict(
-            text=f"<b>{title}</b>", 
-            font=dict(size=20, color='#1e293b', family="Inter, sans-serif")
-        ),
-        margin=dict(l=40, r=40, t=100, b=40),
-        height=450,
-        # --- FIXED X-AXIS ---
-        xaxis=dict(
-            title=dict(
-                text="<b>Timeline (Dates)</b>",
-                font=dict(color="#000000", size=14) # Correct path
-            ),
-            tickfont=dict(color="#000000", size=11, family="Inter, sans-serif"),
-            showline=True, 
-            linecolor='#e2e8f0', 
-            showgrid=False,
-            type='category'
-        ),
-        # --- FIXED Y-AXIS ---
-        yaxis=dict(
-            title=dict(
-                text="<b>Average A Per(%)</b>",
-                font=dict(color="#000000", size=14) # Correct path
-            ),
-            tickfont=dict(color="#000000", size=11, family="Inter, sans-serif"),
-            showgrid=True, 
-            gridcolor='#f1f5f9', 
-            zeroline=False,
-            dtick=1,
-            range=[max(0, min(y_data) - 0.5), min(100, max(y_data) + 1.5)] if len(y_data) > 0 else None
-        ),
-        plot_bgcolor='white',
-        paper_bgcolor='rgba(0,0,0,0)',
-        showlegend=False
+def filtered_means(sheet, cols, mask):
+    def compute():
+        # Sidebar-only selections are answered from the precomputed rollup cube;
+        # a single-site view averages that site's own rows
+        if sid_choice is None:
+            return sheet.cube.means(active_filters, cols)
+        return kpi_means(sheet, cols, mask)
+
+    # The columns carry the selected date / display range, so popular views
+    # (all sites, one region, one TGL) are computed once for everyone. Keyed by
+    # this tab's version (and the master's, which supplies the filter values),
+    # so a refresh that changes one tab keeps the other tabs' entries
+    versions = (tab_versions.get(sheet.name), tab_versions.get("AVAILABILITY"))
+    return aggregate_cache().get_or_compute((versions, view_key, sheet.name, tuple(cols)), compute)
+# 6. CHART FUNCTION (create_advanced_chart lives in network_charts.py)
+@st.cache_resource
+def figure_cache():
+    # Built figures shared by every session; st.plotly_chart only reads them
+    return AggregateCache(maxsize=128)
+
+def cached_advanced_chart(x_labels, y_data, title, color, y_label, is_percent=True):
+    y_values = np.asarray(y_data, dtype=np.float64)
+    key = (tuple(x_labels), y_values.tobytes(), title, color, y_label, is_percent)
+    return figure_cache().get_or_compute(
+        key, lambda: create_advanced_chart(x_labels, y_values, title, color, y_label, is_percent)
     )
-    
-    return fig
 
 # 7. DASHBOARD UI
 st.markdown('<h1 style="color: #0f172a;">Network Intelligence Portal</h1>', unsafe_allow_html=True)
@@ -331,13 +364,14 @@ def create_tech_comparison_chart(tech_dict, dates):
     # Colors: Zong Purple, Zong Green, Zong Blue
     colors = {"2G": "#7030a0", "3G": "#92d050", "4G": "#2e75b6"}
     
-    for tech, t_df in tech_dict.items():
+    for tech, t_model in tech_dict.items():
         # Find dates that exist in THIS specific sheet
-        valid_dates = [d for d in dates if d in t_df.columns]
+        # (every day of the tab: days older than the in-memory ones come from disk)
+        valid_dates = [d for d in dates if d in t_model.schema.date_cols]
         if not valid_dates: continue
         
         # Calculate the average availability for the whole sheet for those dates
-        y_values = t_df[valid_dates].apply(pd.to_numeric, errors='coerce').mean()
+        y_values = t_model.cube.means({}, valid_dates)
         
         fig.add_trace(go.Scatter(
             x=[str(d).split(' ')[0] for d in valid_dates], 
@@ -362,10 +396,10 @@ def create_tech_comparison_chart(tech_dict, dates):
 # --- TOP 3 METRIC CARDS (With Delta Analysis) ---
 m1, m2, m3 = st.columns(3)
 
-with m1:
-    if selected_date and selected_date in filt_df.columns:
+with m1, timer.stage("metric_availability"):
+    if selected_date and selected_date in date_cols:
         # 1. Calculate Current Average
-        current_val = pd.to_numeric(filt_df[selected_date], errors='coerce').mean()
+        current_val = filtered_means(avail_model, [selected_date], row_mask)[selected_date]
         
         # 2. Delta Logic: Find the previous day's data
         delta_label = None
@@ -374,7 +408,7 @@ with m1:
             date_idx = date_cols.index(selected_date)
             if date_idx > 0:
                 prev_date_col = date_cols[date_idx - 1]
-                prev_val = pd.to_numeric(filt_df[prev_date_col], errors='coerce').mean()
+                prev_val = filtered_means(avail_model, [prev_date_col], row_mask)[prev_date_col]
                 
                 # Calculate the difference
                 diff = current_val - prev_val
@@ -391,10 +425,10 @@ with m1:
     else:
         st.metric("Availability Data", "N/A")
 
-with m2:
+with m2, timer.stage("metric_tch"):
     if latest_tch_col:
         # 1. Calculate Current Average for the filtered sites
-        current_tch_val = pd.to_numeric(filt_df[latest_tch_col], errors='coerce').mean()
+        current_tch_val = filtered_means(avail_model, [latest_tch_col], row_mask)[latest_tch_col]
         
         # 2. Delta Logic: Find the previous TCH column
         tch_delta_label = None
@@ -403,7 +437,7 @@ with m2:
             tch_idx = tch_cols.index(latest_tch_col)
             if tch_idx > 0:
                 prev_tch_col = tch_cols[tch_idx - 1]
-                prev_tch_val = pd.to_numeric(filt_df[prev_tch_col], errors='coerce').mean()
+                prev_tch_val = filtered_means(avail_model, [prev_tch_col], row_mask)[prev_tch_col]
                 
                 # Calculate the difference
                 tch_diff = current_tch_val - prev_tch_val
@@ -425,7 +459,7 @@ with m2:
 
 with m3:
     # Total count of active sites in the current filter
-    st.metric("Total Active Sites", len(filt_df))
+    st.metric("Total Active Sites", len(row_positions))
 
 # --- TREND GRAPHS (TABBED INTERFACE) ---
 if len(date_cols) > 1:
@@ -444,52 +478,51 @@ if len(date_cols) > 1:
             label_visibility="collapsed"
         )
 
-    # 2. Define the Tabs
+    # 2. Define the Tabs (lazy: switching tabs reruns, and only the open tab is built)
     tab_site, tab_avail, tab_2g, tab_3g, tab_4g = st.tabs([
         "Site Availability", "Cell Availability", "2G Cell Availability", "3G Cell Availability", "4G Cell Availability"
-    ])
+    ], key="perf_tab", on_change="rerun")
 
     # 3. Helper Function to Process & Render each tech
     def render_tech_chart(tab_obj, tech_key, color, y_label):
+        if not tab_obj.open:
+            return  # Hidden tab: no aggregation, no figure, nothing sent to the browser
         with tab_obj:
-            t_df = tech_dfs.get(tech_key)
-            if t_df is not None:
-                # Apply Global Sidebar Filters to this specific tech dataframe
-                t_filt = t_df.copy()
-                if search_sid != "All Sites":
-                    t_filt = t_filt[t_filt['SID'].astype(str) == search_sid]
-                if sel_region:
-                    t_filt = t_filt[t_filt['REGION'].isin(sel_region)]
-                if sel_tgl:
-                    t_filt = t_filt[t_filt['TGL'].isin(sel_tgl)]
-
-                # ADD THESE TWO NEW FILTERS BELOW:
-                if sel_usf:
-                    if 'NEW USF SITES' in t_filt.columns:
-                        t_filt = t_filt[t_filt['NEW USF SITES'].isin(sel_usf)]
-            
-                if sel_rev:
-                    if 'REVENUE CAT' in t_filt.columns:
-                        t_filt = t_filt[t_filt['REVENUE CAT'].isin(sel_rev)]    
+            t_model = tech_models.get(tech_key)
+            if t_model is not None:
+                # Apply the Global Sidebar Filters by lining this sheet's sites up
+                # with AVAILABILITY, so filters work even on columns the tab lacks
+                # (without a SID pick the rollup cube already has them lined up)
+                if sid_choice is None:
+                    t_mask = None
+                elif t_model.master_pos is not None:
+                    t_mask = align_mask(t_model, row_mask)
+                else:
+                    # No SID column to line up with: filter on its own columns
+                    t_mask = filter_mask(t_model, sid_choice, active_filters)
                 
                 # Identify date columns for this sheet
-                t_dates = [c for c in t_filt.columns if '-' in c and c[0].isdigit()]
+                t_dates = t_model.schema.date_cols
                 t_trend_days = t_dates[-num_days:]
                 
                 if t_trend_days:
                     # Calculate means
-                    t_values = t_filt[t_trend_days].apply(pd.to_numeric, errors='coerce').mean()
+                    with timer.stage(f"aggregate_{tech_key}"):
+                        t_values = filtered_means(t_model, t_trend_days, t_mask)
                     
                     # Create the chart using your existing custom function
-                    fig = create_advanced_chart(
-                        t_trend_days, 
-                        t_values, 
-                        f"{tech_key} Trend (Last {len(t_trend_days)} Days)", 
-                        color, 
-                        y_label,
-                        is_percent=(tech_key in ["AVAILABILITY", "SITE_AVAIL"])
-                    )
-                    st.plotly_chart(fig, use_container_width=True)
+                    with timer.stage(f"figure_{tech_key}"):
+                        fig = cached_advanced_chart(
+                            t_model.schema.date_labels[-len(t_trend_days):], 
+                            t_values, 
+                            f"{tech_key} Trend (Last {len(t_trend_days)} Days)", 
+                            color, 
+                            y_label,
+                            is_percent=(tech_key in ["AVAILABILITY", "SITE_AVAIL"])
+                        )
+                    # st.plotly_chart serializes the figure to JSON for the browser
+                    with timer.stage(f"serialize_{tech_key}"):
+                        st.plotly_chart(fig, use_container_width=True)
                 else:
                     st.info(f"No date-based records found for {tech_key}")
 
@@ -503,9 +536,9 @@ if len(date_cols) > 1:
     st.markdown('</div>', unsafe_allow_html=True)
 
 # --- 8. SITE SPECIFIC DETAILS & MAP ---
-if search_sid != "All Sites" and len(filt_df) == 1:
+if search_sid != "All Sites" and len(row_positions) == 1:
     st.write("---")
-    row = filt_df.iloc[0]
+    row = site_details(avail_model, row_positions[0])  # the one site's metadata only
     
     # DISPLAY SITE METADATA USING YOUR CUSTOM CSS
     st.markdown(f"### 📋 Site Information: {row['SID']}")
@@ -547,4 +580,25 @@ if search_sid != "All Sites" and len(filt_df) == 1:
         )
         st.link_button("🚀 Open in Google Maps App", f"https://www.google.com/maps/search/?api=1&query={lat},{lon}")
     else:
-        st.warning("Coordinates not available for this site.")
\ No newline at end of file
+        st.warning("Coordinates not available for this site.")
+
+# --- 9. RERUN TIMINGS (admin panel with NETWORK_PERF_PANEL=1) ---
+stage_metrics().record(timer)
+
+if PERF_PANEL:
+    with st.sidebar.expander("⏱️ Performance (admin)"):
+        st.caption(f"This rerun: {timer.total() * 1000:.0f} ms")
+        st.dataframe(
+            pd.DataFrame({"ms": {stage: round(sec * 1000, 1) for stage, sec in timer.stages.items()}}),
+            use_container_width=True
+        )
+        st.caption("Recent reruns (this worker)")
+        st.dataframe(pd.DataFrame(stage_metrics().summary("rerun")), hide_index=True, use_container_width=True)
+        st.caption("Background refreshes")
+        st.dataframe(pd.DataFrame(stage_metrics().summary("refresh")), hide_index=True, use_container_width=True)
+        st.caption(f"Aggregate cache: {aggregate_cache().stats()}")
+        st.caption(f"Filtered views (this session): {session_view_cache().stats()}")
+        st.download_button(
+            "Prometheus metrics", stage_metrics().prometheus_text(),
+            file_name="network_dashboard_metrics.prom", mime="text/plain"
+        )
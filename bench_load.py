@@ -0,0 +1,107 @@
+"""Cold-load benchmark: sequential vs parallel tab fetch.
+
+Uses a local fake of GSheetsConnection with injected latency, so it runs
+without network or credentials. Also checks that incremental reads match
+a full read (exit status 1 if not):
+
+    python bench_load.py --latency 0.8 --jitter 0.4 --rows 2000 --days 60
+"""
+import argparse
+import random
+import sys
+import time
+
+import pandas as pd
+
+from network_data import SHEET_URL_KEYS, fetch_sheets, fetch_sheets_sequential, read_sheet, timed
+
+
+class FakeGSheetsConnection:
+    """Stands in for st.connection("gsheets", type=GSheetsConnection).
+
+    read() sleeps for `latency` (+ up to `jitter`) seconds, then returns a
+    small AVAILABILITY-shaped frame. Tabs listed in `fail` raise instead.
+    """
+
+    def __init__(self, latency=0.5, jitter=0.0, rows=500, days=30, fail=(), seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.rows = rows
+        self.days = days
+        self.fail = set(fail)
+        self.rng = random.Random(seed)
+
+    def read(self, spreadsheet=None, ttl=None, **kwargs):
+        time.sleep(self.latency + self.rng.random() * self.jitter)
+        if spreadsheet in self.fail:
+            raise ConnectionError(f"fake failure for {spreadsheet}")
+
+        dates = pd.date_range(end="2026-01-31", periods=self.days).strftime("%Y-%m-%d")
+        data = {
+            "SID ": [f"S{i:05d}" for i in range(self.rows)],
+            "Region": [f"R{i % 5}" for i in range(self.rows)],
+            "TGL": [f"T{i % 20}" for i in range(self.rows)],
+        }
+        for d in dates:
+            data[d] = [95 + (i % 50) / 10 for i in range(self.rows)]
+        df = pd.DataFrame(data)
+        # Honour the column selection used by incremental reads
+        usecols = kwargs.get("usecols")
+        if callable(usecols):
+            df = df[[c for c in df.columns if usecols(c)]]
+        return df
+
+
+def check_incremental_reads(rows=200, days=20):
+    """Incremental reads must equal a full read; returns the failed cases."""
+    conn = FakeGSheetsConnection(latency=0, rows=rows, days=days)
+    full = read_sheet(conn, "AVAILABILITY")
+    cases = {
+        "new day columns": full.iloc[:, :-2],
+        "new site": full.iloc[:-1],  # its held days must not come out blank
+        "removed site": pd.concat([full, full.tail(1).assign(SID="GONE")], ignore_index=True),
+    }
+    return [name for name, held in cases.items()
+            if not read_sheet(conn, "AVAILABILITY", held_df=held).equals(full)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds per read")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random seconds per read")
+    parser.add_argument("--rows", type=int, default=500)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--fail", nargs="*", default=[], help="tab names whose read should raise")
+    args = parser.parse_args()
+
+    # The fake connection gets the tab name as its "URL"
+    links = {name: name for name in SHEET_URL_KEYS}
+
+    seq_times, par_times = [], []
+    for run in range(args.repeat):
+        conn = FakeGSheetsConnection(args.latency, args.jitter, args.rows, args.days, seed=run)
+        _, t = timed(fetch_sheets_sequential, conn, links)
+        seq_times.append(t)
+
+        conn = FakeGSheetsConnection(args.latency, args.jitter, args.rows, args.days, args.fail, seed=run)
+        (dfs, errors), t = timed(fetch_sheets, conn, links)
+        par_times.append(t)
+
+    seq, par = min(seq_times), min(par_times)
+    print(f"tabs:       {len(links)}  (latency {args.latency}s + jitter {args.jitter}s)")
+    print(f"sequential: {seq:.3f}s")
+    print(f"parallel:   {par:.3f}s  ({seq / par:.1f}x faster)")
+    print(f"loaded:     {', '.join(dfs)}")
+    for name, err in errors.items():
+        print(f"failed:     {name} -> {err}")
+
+    failed = check_incremental_reads()
+    if failed:
+        print(f"incremental read differs from a full read: {', '.join(failed)}")
+        sys.exit(1)
+    print("incremental reads match full reads")
+
+
+if __name__ == "__main__":
+    main()
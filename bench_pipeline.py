@@ -0,0 +1,351 @@
+"""Benchmark suite for the app10 data pipeline, run headlessly.
+
+Replays what the app does over fixed synthetic datasets: the refresh
+(load, snapshot), a restart from the snapshot's hot columns and the model
+build, then one dashboard rerun (column detection, filtering, metric cards,
+tab chart aggregation, figure build) and the reads served from disk (older
+days, FUEL, site details). Reports wall time and peak memory per stage:
+
+    python bench_pipeline.py --sizes small medium          # report + compare
+    python bench_pipeline.py --sizes small medium --save-baseline
+
+Compared against bench_baseline.json when it exists; any stage slower or
+hungrier than the baseline (beyond the tolerances) is listed and the run
+exits with status 1. Times are medians after a warm-up run, a stage only
+counts as slower once it is beyond its own run-to-run spread, and slow
+stages are timed again before they are reported.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+import pyarrow as pa
+
+from network_charts import create_advanced_chart
+from network_data import (
+    LocalFileConnection, align_mask, build_network_model, classify_columns, content_hash, fetch_sheets,
+    filter_mask, hot_columns, kpi_means, load_snapshot, local_sheet_links, save_snapshot, site_details
+)
+from synthetic_data import iter_network_tabs, write_tab
+
+# name: (sites, days). Fixed seed and end date so every run sees the same data
+DATASETS = {
+    "small": (1_000, 90),
+    "medium": (10_000, 180),
+    "large": (50_000, 365),
+}
+DATASET_END = "2026-01-31"
+DATASET_SEED = 0
+DATA_DIR = os.path.join(".bench", "data")
+SNAPSHOT_DIR = os.path.join(".bench", "snapshot")
+BASELINE_PATH = "bench_baseline.json"
+
+TREND_DAYS = 30  # widest Display Range in the app
+# (tab, color) as rendered by render_tech_chart
+TABS = [("SITE_AVAIL", "#0ea5e9"), ("AVAILABILITY", "#3b82f6"),
+        ("2G", "#7030a0"), ("3G", "#92d050"), ("4G", "#2e75b6")]
+
+
+def ensure_dataset(size):
+    """Generates the Parquet exports for `size` once; reused afterwards."""
+    sites, days = DATASETS[size]
+    directory = os.path.join(DATA_DIR, f"{size}-{sites}x{days}-s{DATASET_SEED}")
+    if not os.path.exists(os.path.join(directory, "AVAILABILITY.parquet")):
+        os.makedirs(directory, exist_ok=True)
+        for name, df in iter_network_tabs(sites, days, 0.02, DATASET_END, DATASET_SEED):
+            write_tab(df, os.path.join(directory, f"{name}.parquet"))
+    return directory
+
+
+def scenarios(master):
+    """Sidebar selections a user typically goes through: (sid, filters)."""
+    meta = master.meta
+    region = meta['REGION'].cat.categories[0]
+    tgl = meta.loc[meta['REGION'] == region, 'TGL'].mode().iloc[0]
+    return [
+        (None, {}),
+        (None, {"REGION": [region]}),
+        (None, {"REGION": [region], "TGL": [tgl]}),
+        (None, {"REVENUE CAT": ["GOLD", "PLATINUM"], "NEW USF SITES": ["USF"]}),
+        (meta['SID'].iloc[len(meta) // 2], {}),
+    ]
+
+
+def view_means(sheet, sid, filters, cols, mask):
+    """filtered_means in app10, minus the shared cache (always the cold path)."""
+    if sid is None:
+        return sheet.cube.means(filters, cols)
+    return kpi_means(sheet, cols, mask)
+
+
+# --- STAGES (each reads and extends the shared state dict) ---
+def stage_load(state):
+    dfs, errors = fetch_sheets(LocalFileConnection(), local_sheet_links(state["dir"]))
+    if errors:
+        raise RuntimeError(f"Benchmark data failed to load: {errors}")
+    state["dfs"] = dfs
+
+
+def stage_snapshot(state):
+    # Each run writes every tab, like a refresh that finds all of them changed
+    shutil.rmtree(state["snapshot_dir"], ignore_errors=True)
+    state["versions"] = {name: content_hash(df) for name, df in state["dfs"].items()}
+    save_snapshot(state["dfs"], state["snapshot_dir"], hashes=state["versions"])
+
+
+def stage_restart(state):
+    """What a (re)started app reads: only the hot columns of the snapshot."""
+    state["hot_dfs"], _ = load_snapshot(state["snapshot_dir"], columns=hot_columns)
+
+
+def stage_model(state):
+    state["models"] = build_network_model(state["hot_dfs"], state["versions"], snapshot_dir=state["snapshot_dir"])
+    state["scenarios"] = scenarios(state["models"]["AVAILABILITY"])
+
+
+def stage_columns(state):
+    state["schemas"] = {name: classify_columns(df.columns) for name, df in state["dfs"].items()}
+
+
+def stage_filter(state):
+    master = state["models"]["AVAILABILITY"]
+    state["masks"] = []
+    for sid, filters in state["scenarios"]:
+        row_mask = filter_mask(master, sid, filters)
+        row_positions = np.flatnonzero(row_mask)
+        state["masks"].append((row_mask, len(row_positions)))
+
+
+def stage_metrics(state):
+    master = state["models"]["AVAILABILITY"]
+    schema = master.schema
+    cards = []
+    for (sid, filters), (row_mask, n_sites) in zip(state["scenarios"], state["masks"]):
+        day, prev_day = schema.date_cols[-1], schema.date_cols[-2]
+        tch, prev_tch = schema.tch_cols[-1], schema.tch_cols[-2]
+        avail = view_means(master, sid, filters, [day, prev_day], row_mask)
+        tch_vals = view_means(master, sid, filters, [tch, prev_tch], row_mask)
+        cards.append((avail[day], avail[day] - avail[prev_day],
+                      tch_vals[tch], tch_vals[tch] - tch_vals[prev_tch], n_sites))
+    state["cards"] = cards
+
+
+def tab_mask(t_model, sid, filters, row_mask):
+    """The tab's rows for a selection, as render_tech_chart works them out."""
+    if sid is None:
+        return None
+    if t_model.master_pos is not None:
+        return align_mask(t_model, row_mask)
+    return filter_mask(t_model, sid, filters)
+
+
+def stage_tech_chart(state):
+    models = state["models"]
+    trends = {}
+    for (sid, filters), (row_mask, _) in zip(state["scenarios"], state["masks"]):
+        for name, _ in TABS:
+            t_model = models[name]
+            t_mask = tab_mask(t_model, sid, filters, row_mask)
+            t_days = t_model.schema.date_cols[-TREND_DAYS:]
+            trends[name] = (t_model.schema.date_labels[-len(t_days):],
+                            view_means(t_model, sid, filters, t_days, t_mask))
+    state["trends"] = trends
+
+
+def stage_cold(state):
+    """Reads served from the snapshot: an old day's card, FUEL, an old trend, site details."""
+    models = state["models"]
+    for model in models.values():
+        model.cube.clear_cold()  # every run pays for the disk reads
+    master = models["AVAILABILITY"]
+    schema = master.schema
+    card_cols = schema.date_cols[:2] + schema.fuel_cols[-2:]
+    for (sid, filters), (row_mask, _) in zip(state["scenarios"], state["masks"]):
+        view_means(master, sid, filters, card_cols, row_mask)
+        for name, _ in TABS:
+            t_model = models[name]
+            t_days = t_model.schema.date_cols[:TREND_DAYS]
+            view_means(t_model, sid, filters, t_days, tab_mask(t_model, sid, filters, row_mask))
+        if sid is not None:
+            for position in np.flatnonzero(row_mask):
+                site_details(master, position)
+
+
+def stage_figure(state):
+    for name, color in TABS:
+        labels, values = state["trends"][name]
+        for days in (7, TREND_DAYS):  # labelled and compact charts
+            create_advanced_chart(labels[-days:], values.to_numpy()[-days:],
+                                  f"{name} Trend (Last {days} Days)", color, "Avail %")
+
+
+STAGES = [
+    ("load", stage_load),
+    ("snapshot", stage_snapshot),
+    ("restart", stage_restart),
+    ("model", stage_model),
+    ("columns", stage_columns),
+    ("filter", stage_filter),
+    ("metrics", stage_metrics),
+    ("tech_chart", stage_tech_chart),
+    ("figure", stage_figure),
+    ("cold", stage_cold),
+]
+
+
+class ArrowPeak:
+    """Samples pyarrow's allocator while a stage runs.
+
+    tracemalloc sees Python and numpy allocations but not Arrow buffers
+    (Parquet reads), so those are tracked here and added on top.
+    """
+
+    def __init__(self, interval=0.0005):
+        self.interval = interval
+        self.peak = 0
+
+    def __enter__(self):
+        self.start = pa.total_allocated_bytes()
+        self.done = threading.Event()
+        self.thread = threading.Thread(target=self._sample, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.done.set()
+        self.thread.join()
+
+    def _sample(self):
+        while not self.done.is_set():
+            self.peak = max(self.peak, pa.total_allocated_bytes() - self.start)
+            self.done.wait(self.interval)
+
+
+def time_stage(stage, state, repeat):
+    """{"seconds": median wall time, "spread": median absolute deviation}.
+
+    One untimed run first, so first-touch costs (page faults, lazy imports,
+    empty caches) don't land in the timings.
+    """
+    stage(state)
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        stage(state)
+        times.append(time.perf_counter() - start)
+    median = float(np.median(times))
+    return {"seconds": median, "spread": float(np.median(np.abs(np.array(times) - median)))}
+
+
+def run_suite(directory, snapshot_dir, repeat):
+    """({stage: time_stage(...) plus "peak_mb"}, state after the last stage)."""
+    state = {"dir": directory, "snapshot_dir": snapshot_dir}
+    results = {}
+    for name, stage in STAGES:
+        results[name] = time_stage(stage, state, repeat)
+
+        # Separate pass for memory: tracing slows the stage down
+        tracemalloc.start()
+        with ArrowPeak() as arrow:
+            stage(state)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[name]["peak_mb"] = (peak + arrow.peak) / 2**20
+    return results, state
+
+
+def too_slow(now, base, tolerance):
+    """Slower than the baseline by more than the tolerance and the noise.
+
+    Noise is three standard deviations (1.4826 x the median absolute
+    deviation) of the noisier of the two runs, with a 5ms floor for timer
+    jitter.
+    """
+    noise = max(3 * 1.4826 * max(base.get("spread", 0), now.get("spread", 0)), 0.005)
+    return now["seconds"] - base["seconds"] > max(base["seconds"] * tolerance, noise)
+
+
+def recheck_slow_stages(results, state, baseline, tolerance, repeat):
+    """Times stages that look slower once more; a stage fails only if both runs were slow."""
+    stages = dict(STAGES)
+    for name, now in results.items():
+        base = baseline.get(name)
+        if base is not None and too_slow(now, base, tolerance):
+            print(f"  {name}: {now['seconds'] * 1000:.1f}ms vs baseline {base['seconds'] * 1000:.1f}ms, timing again")
+            again = time_stage(stages[name], state, repeat)
+            if again["seconds"] < now["seconds"]:
+                now.update(again)
+
+
+def find_regressions(results, baseline, tolerance, memory_tolerance):
+    """Stage-by-stage comparison; returns human-readable regression lines."""
+    problems = []
+    for size, stages in results.items():
+        for stage, now in stages.items():
+            base = baseline.get(size, {}).get(stage)
+            if base is None:
+                continue
+            if too_slow(now, base, tolerance):
+                problems.append(f"{size}/{stage}: {now['seconds'] * 1000:.1f}ms "
+                                f"vs baseline {base['seconds'] * 1000:.1f}ms")
+            # Absolute floor keeps allocator-sampling jitter from failing the run
+            if now["peak_mb"] > base["peak_mb"] * (1 + memory_tolerance) and now["peak_mb"] - base["peak_mb"] > 2:
+                problems.append(f"{size}/{stage}: peak {now['peak_mb']:.1f}MB "
+                                f"vs baseline {base['peak_mb']:.1f}MB")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", nargs="+", choices=list(DATASETS), default=["small", "medium"])
+    parser.add_argument("--repeat", type=int, default=10, help="timed runs per stage (median is kept)")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown per stage")
+    parser.add_argument("--memory-tolerance", type=float, default=0.10, help="allowed peak memory growth")
+    args = parser.parse_args()
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    results = {}
+    for size in args.sizes:
+        sites, days = DATASETS[size]
+        print(f"\n{size}: {sites} sites x {days} days")
+        directory = ensure_dataset(size)
+        results[size], state = run_suite(directory, os.path.join(SNAPSHOT_DIR, os.path.basename(directory)), args.repeat)
+        for stage, r in results[size].items():
+            print(f"  {stage:<11} {r['seconds'] * 1000:>9.1f} ms ±{r['spread'] * 1000:<6.1f} {r['peak_mb']:>8.1f} MB peak")
+        if not args.save_baseline:
+            # While this dataset's state is still around
+            recheck_slow_stages(results[size], state, baseline.get(size, {}), args.tolerance, args.repeat)
+
+    if args.save_baseline:
+        baseline.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"\nBaseline saved to {args.baseline}")
+        return
+
+    if not baseline:
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to create one.")
+        return
+    problems = find_regressions(results, baseline, args.tolerance, args.memory_tolerance)
+    if problems:
+        print("\nREGRESSIONS against", args.baseline)
+        for line in problems:
+            print("  " + line)
+        sys.exit(1)
+    print(f"\nNo regressions against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
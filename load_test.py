@@ -0,0 +1,240 @@
+"""Headless load test: N concurrent dashboard sessions driven by AppTest.
+
+Each session logs in, then goes through a realistic filter sequence (pick
+a region, search for a SID and pick it, switch tabs, change the Display
+Range, clear) against
+app10.py running on a synthetic dataset in offline mode. All sessions share
+one process, so they share the st.cache_resource layers the way sessions on
+one server worker do:
+
+    python load_test.py --sessions 8 --steps 20 --sites 10000 --days 180 2>/dev/null
+
+Reports rerun latency percentiles (overall and per action) and memory on
+stdout; Streamlit's per-run warnings go to stderr.
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pyarrow.parquet as pq
+
+from synthetic_data import iter_network_tabs, write_tab
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app10.py")
+DATA_DIR = os.path.join(".bench", "data")
+TAB_LABELS = ["Site Availability", "Cell Availability", "2G Cell Availability",
+              "3G Cell Availability", "4G Cell Availability"]
+DISPLAY_RANGES = [7, 14, 21, 30]
+
+
+def ensure_dataset(sites, days, seed=0):
+    """Parquet exports of a fixed synthetic dataset, generated once."""
+    directory = os.path.join(DATA_DIR, f"load-{sites}x{days}-s{seed}")
+    if not os.path.exists(os.path.join(directory, "AVAILABILITY.parquet")):
+        os.makedirs(directory, exist_ok=True)
+        for name, df in iter_network_tabs(sites, days, 0.02, "2026-01-31", seed):
+            write_tab(df, os.path.join(directory, f"{name}.parquet"))
+    return directory
+
+
+def allow_concurrent_apptests():
+    """Lets several AppTest sessions run at once in one process.
+
+    AppTest installs a mock Runtime singleton for each run and clears it
+    when the run ends, which breaks any other session mid-run. Keep the
+    last mock visible instead; the mocks are interchangeable. Its per-run
+    override of the "global.appTest" option is undone the same way, so it
+    is set once for the whole process. It also compiles the script afresh
+    per run, and concurrent ast.parse calls crash on Python 3.11, so
+    compile once and share the bytecode like the server's ScriptCache does.
+    """
+    from streamlit import config
+    from streamlit.runtime.runtime import Runtime
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.testing.v1.util import build_mock_config_get_option
+
+    config.get_option = build_mock_config_get_option({"global.appTest": True})
+
+    last = {}
+    compiled = {}
+    compile_lock = threading.Lock()
+    get_bytecode = ScriptCache.get_bytecode
+
+    def shared_bytecode(self, script_path):
+        with compile_lock:
+            if script_path not in compiled:
+                compiled[script_path] = get_bytecode(self, script_path)
+            return compiled[script_path]
+
+    ScriptCache.get_bytecode = shared_bytecode
+
+    def instance(cls):
+        if cls._instance is not None:
+            last["runtime"] = cls._instance
+        runtime = cls._instance or last.get("runtime")
+        if runtime is None:
+            raise RuntimeError("Runtime hasn't been created!")
+        return runtime
+
+    Runtime.instance = classmethod(instance)
+    Runtime.exists = classmethod(lambda cls: cls._instance is not None or "runtime" in last)
+
+
+def rss_mb():
+    """Resident memory of this process (Linux), or peak RSS elsewhere."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Session:
+    """One simulated user. Every action is one timed rerun.
+
+    `sids` are the dataset's Station IDs, to type pieces of into the search box.
+    """
+
+    def __init__(self, session_id, rng, timeout, sids=()):
+        from streamlit.testing.v1 import AppTest
+
+        self.session_id = session_id
+        self.rng = rng
+        self.sids = sids
+        self.latencies = []  # (action, seconds)
+        self.errors = []
+        self.at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+        self.at.session_state["password_correct"] = True
+
+    def _timed(self, action, run):
+        start = time.perf_counter()
+        run()
+        self.latencies.append((action, time.perf_counter() - start))
+        self.errors.extend(f"{action}: {e.value}" for e in self.at.exception)
+
+    def open(self):
+        self._timed("open", self.at.run)
+
+    def pick_region(self):
+        widget = self.at.multiselect(key="region_filter")
+        if widget.options:
+            self._timed("region", widget.set_value([self.rng.choice(widget.options)]).run)
+
+    def pick_sid(self):
+        # Type part of a real SID into the search box, then pick one of the matches
+        sid = self.rng.choice(self.sids)
+        start = self.rng.randrange(len(sid))
+        query = sid[start:start + self.rng.randint(2, 6)]
+        self._timed("search", self.at.text_input(key="sid_query").input(query).run)
+        matches = self.at.selectbox(key="sid_filter").options[1:]
+        if matches:
+            widget = self.at.selectbox(key="sid_filter")
+            self._timed("sid", widget.select(self.rng.choice(matches)).run)
+
+    def switch_tab(self):
+        self.at.session_state["perf_tab"] = self.rng.choice(TAB_LABELS)
+        self._timed("tab", self.at.run)
+
+    def change_range(self):
+        widget = self.at.selectbox(key="graph_duration_selector")
+        self._timed("range", widget.select(self.rng.choice(DISPLAY_RANGES)).run)
+
+    def clear(self):
+        self._timed("clear", self.at.sidebar.button[0].click().run)
+
+    def run(self, steps, think_time):
+        self.open()
+        actions = [self.pick_region, self.switch_tab, self.change_range, self.pick_sid,
+                   self.switch_tab, self.change_range, self.clear]
+        weights = [3, 4, 3, 2, 4, 3, 1]
+        for _ in range(steps):
+            self.rng.choices(actions, weights)[0]()
+            if think_time:
+                time.sleep(self.rng.uniform(0, think_time))
+        return self
+
+
+def percentiles(seconds):
+    ms = np.asarray(seconds) * 1000
+    return {p: float(np.percentile(ms, p)) for p in (50, 95, 99)} | {"max": float(ms.max())}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=4, help="concurrent users")
+    parser.add_argument("--steps", type=int, default=15, help="actions per session after opening")
+    parser.add_argument("--sites", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--think-time", type=float, default=0.0, help="max random pause between actions (s)")
+    parser.add_argument("--timeout", type=float, default=120, help="per-rerun timeout (s)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    # Offline mode on the synthetic data; must be set before the app imports network_data
+    os.environ["NETWORK_DATA_DIR"] = ensure_dataset(args.sites, args.days)
+    sids = pq.read_table(os.path.join(os.environ["NETWORK_DATA_DIR"], "AVAILABILITY.parquet"),
+                         columns=["SID"]).column("SID").to_pylist()
+    os.environ.setdefault("NETWORK_SNAPSHOT_DIR", os.path.join(".bench", "snapshot"))
+
+    allow_concurrent_apptests()
+
+    # Warm the process-wide caches once, like a server that is already up
+    start = time.perf_counter()
+    Session("warmup", random.Random(args.seed), args.timeout).open()
+    print(f"warm-up (first load): {time.perf_counter() - start:.2f}s")
+
+    base_rss = rss_mb()
+    peak_rss = [base_rss]
+    done = threading.Event()
+
+    def sample_rss():
+        while not done.wait(0.05):
+            peak_rss[0] = max(peak_rss[0], rss_mb())
+
+    sampler = threading.Thread(target=sample_rss, daemon=True)
+    sampler.start()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.sessions) as pool:
+        futures = [
+            pool.submit(lambda i: Session(i, random.Random(args.seed + i), args.timeout, sids)
+                        .run(args.steps, args.think_time), i)
+            for i in range(args.sessions)
+        ]
+        sessions = [f.result() for f in futures]
+    elapsed = time.perf_counter() - start
+    done.set()
+    end_rss = rss_mb()
+
+    latencies = [(a, s) for session in sessions for a, s in session.latencies]
+    print(f"\n{args.sessions} sessions x {args.steps} steps on {args.sites} sites x {args.days} days: "
+          f"{len(latencies)} reruns in {elapsed:.1f}s ({len(latencies) / elapsed:.1f} reruns/s)")
+
+    print(f"\n{'action':<8} {'runs':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for action in ["all", "open", "region", "search", "sid", "tab", "range", "clear"]:
+        seconds = [s for a, s in latencies if action in ("all", a)]
+        if seconds:
+            p = percentiles(seconds)
+            print(f"{action:<8} {len(seconds):>5} {p[50]:>9.1f} {p[95]:>9.1f} {p[99]:>9.1f} {p['max']:>9.1f}")
+
+    # Per session from the peak, when every session is live at once; the RSS
+    # after they finish says more about what the allocator gave back
+    print(f"\nmemory: {base_rss:.0f} MB before sessions, peak {peak_rss[0]:.0f} MB "
+          f"({(peak_rss[0] - base_rss) / args.sessions:.1f} MB per session), {end_rss:.0f} MB after")
+
+    errors = [f"session {s.session_id}: {e}" for s in sessions for e in s.errors]
+    if errors:
+        print(f"\n{len(errors)} reruns raised:")
+        for line in errors[:10]:
+            print("  " + line)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Plotly figure builders for the dashboard (no Streamlit calls).
+
+Kept out of app10.py so the benchmark suite can build the exact figures the
+app shows.
+"""
+import numpy as np
+import plotly.graph_objects as go
+
+COMPACT_CHART_POINTS = 14  # above this, charts drop the per-point value labels
+
+
+def create_advanced_chart(x_labels, y_data, title, color, y_label, is_percent=True, compact=None):
+    # x_labels come ready-made from the sheet schema ('25-Jan', 'FEB'), no date parsing here
+    # Compact mode: no per-point text labels, y sent as a typed float32 array
+    if compact is None:
+        compact = len(x_labels) > COMPACT_CHART_POINTS
+
+    fig = go.Figure()
+
+    if compact:
+        point_style = dict(
+            y=np.asarray(y_data, dtype=np.float32),
+            mode='lines+markers',
+            hovertemplate="%{x}: %{y:.2f}" + ("%" if is_percent else "") + "<extra></extra>"
+        )
+    else:
+        point_style = dict(
+            y=y_data,
+            mode='lines+markers+text',
+            text=[f"<b>{v:.2f}%</b>" if is_percent else f"<b>{v:.2f}</b>" for v in y_data],
+            textposition="top center", 
+            textfont=dict(
+                family="Inter, sans-serif",
+                size=12,          
+                color="#000000"   
+            ),
+            hoverinfo="x+y"
+        )
+
+    fig.add_trace(go.Scatter(
+        x=list(x_labels), 
+        **point_style,
+        cliponaxis=False, 
+        line=dict(width=4, color=color, shape='spline'), 
+        marker=dict(
+            size=10, 
+            color='white', 
+            line=dict(color=color, width=3)
+        ),
+        fill='tozeroy',
+        fillcolor=f'rgba{tuple(list(int(color.lstrip("#")[i:i+2], 16) for i in (0, 2, 4)) + [0.1])}'
+    ))
+
+    fig.update_layout(
+        title=dict(
+            text=f"<b>{title}</b>", 
+            font=dict(size=20, color='#1e293b', family="Inter, sans-serif")
+        ),
+        margin=dict(l=40, r=40, t=100, b=40),
+        height=450,
+        # --- FIXED X-AXIS ---
+        xaxis=dict(
+            title=dict(
+                text="<b>Timeline (Dates)</b>",
+                font=dict(color="#000000", size=14) # Correct path
+            ),
+            tickfont=dict(color="#000000", size=11, family="Inter, sans-serif"),
+            showline=True, 
+            linecolor='#e2e8f0', 
+            showgrid=False,
+            type='category'
+        ),
+        # --- FIXED Y-AXIS ---
+        yaxis=dict(
+            title=dict(
+                text="<b>Average A Per(%)</b>",
+                font=dict(color="#000000", size=14) # Correct path
+            ),
+            tickfont=dict(color="#000000", size=11, family="Inter, sans-serif"),
+            showgrid=True, 
+            gridcolor='#f1f5f9', 
+            zeroline=False,
+            dtick=1,
+            range=[max(0, min(y_data) - 0.5), min(100, max(y_data) + 1.5)] if len(y_data) > 0 else None
+        ),
+        plot_bgcolor='white',
+        paper_bgcolor='rgba(0,0,0,0)',
+        showlegend=False
+    )
+    
+    return fig
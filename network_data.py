@@ -0,0 +1,1501 @@
+"""Data helpers for the Network Intelligence Portal (app10.py).
+
+Kept free of Streamlit calls so the same code can be driven headlessly
+by the benchmark scripts.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from dataclasses import dataclass, field, replace
+from functools import partial
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+# Tab name -> key of its URL under [connections.gsheets] in secrets.toml
+SHEET_URL_KEYS = {
+    "SITE_AVAIL": "url_site",
+    "AVAILABILITY": "url_avail",
+    "2G": "url_2g",
+    "3G": "url_3g",
+    "4G": "url_4g",
+}
+
+# Most recent held date columns that are re-read on every incremental refresh
+RECHECK_DAYS = 3
+
+
+def sheet_links_from_secrets(gsheets_secrets):
+    """Maps each tab name to its spreadsheet URL."""
+    return {name: gsheets_secrets[key] for name, key in SHEET_URL_KEYS.items()}
+
+
+def clean_columns(df):
+    """Standardize column names (fixes KeyError for 'GRID ' or 'REVENUE CAT ')."""
+    df.columns = [str(c).strip().upper() for c in df.columns]
+    return df
+
+
+def is_date_col(col):
+    """True for the daily 'YYYY-MM-DD' columns."""
+    return '-' in col and col[0].isdigit()
+
+
+def read_sheet(conn, link, held_df=None, recheck_days=RECHECK_DAYS):
+    """Reads one tab, incrementally when a previous copy is available.
+
+    With `held_df` (the tab as stored in the snapshot) only the columns we
+    don't already hold are parsed: metadata, TCH%/FUEL columns, new date
+    columns, and the last `recheck_days` held dates (recent days are often
+    back-filled). The held history is then merged back in by SID. The whole
+    tab is read instead if the incremental read fails or new SIDs appear.
+    """
+    if held_df is None or not _has_unique_sid(held_df):
+        return clean_columns(conn.read(spreadsheet=link, ttl=0))
+
+    held_dates = [c for c in held_df.columns if is_date_col(c)]
+    wanted = UnheldColumns(tuple(held_dates[:max(0, len(held_dates) - recheck_days)]))
+
+    try:
+        fresh = clean_columns(conn.read(spreadsheet=link, ttl=0, usecols=wanted))
+    except Exception:
+        logger.warning("Incremental read of %s failed; reading the whole tab", link, exc_info=True)
+        return clean_columns(conn.read(spreadsheet=link, ttl=0))
+    new_sites = _has_unique_sid(fresh) and not fresh['SID'].astype(str).isin(held_df['SID'].astype(str)).all()
+    if not wanted.header or not _has_unique_sid(fresh) or new_sites:
+        # Header not seen (a cached answer), rows can't be lined up by SID, or
+        # new sites may bring their own history with them: take the whole sheet
+        return clean_columns(conn.read(spreadsheet=link, ttl=0))
+    return merge_day_columns(held_df, fresh, wanted.header)
+
+
+@dataclass
+class UnheldColumns:
+    """usecols predicate for read_sheet: skips the held days, notes the header.
+
+    A dataclass rather than a closure because GSheetsConnection.read caches
+    on its arguments, and st.cache_data hashes dataclasses (by their
+    fields) but not functions. pandas calls it once per header cell, in
+    sheet order.
+    """
+    reuse: tuple
+    header: list = field(default_factory=list)
+
+    def __call__(self, col):
+        name = str(col).strip().upper()
+        self.header.append(name)
+        return name not in self.reuse
+
+
+def _has_unique_sid(df):
+    return 'SID' in df.columns and df['SID'].astype(str).is_unique
+
+
+def merge_day_columns(held_df, fresh, header):
+    """Combines freshly read columns with the held date history.
+
+    Rows follow `fresh` (removed sites drop out) and columns follow the
+    live sheet's `header` order.
+    """
+    keep = [c for c in held_df.columns if c in header and c not in fresh.columns]
+    history = held_df[keep].set_axis(held_df['SID'].astype(str))
+    history = history.reindex(fresh['SID'].astype(str)).set_axis(fresh.index)
+    merged = pd.concat([fresh, history], axis=1)
+    return merged[[c for c in dict.fromkeys(header) if c in merged.columns]]
+
+
+def fetch_sheets(conn, sheet_links, held=None, max_workers=5, timeout=60):
+    """Reads all tabs at the same time on a bounded thread pool.
+
+    `held` maps tab names to previously loaded frames; those tabs are read
+    incrementally (see read_sheet). Returns (dfs, errors): the tabs that
+    loaded, and a message for each tab that failed or did not answer within
+    `timeout` seconds. A broken tab never takes the others down with it.
+    """
+    dfs, errors = {}, {}
+    if not sheet_links:
+        return dfs, errors
+    held = held or {}
+
+    pool = ThreadPoolExecutor(max_workers=min(max_workers, len(sheet_links)))
+    try:
+        futures = {
+            pool.submit(read_sheet, conn, link, held.get(name)): name
+            for name, link in sheet_links.items()
+        }
+        done, pending = wait(futures, timeout=timeout)
+
+        for future in done:
+            name = futures[future]
+            try:
+                dfs[name] = future.result()
+            except Exception as e:
+                errors[name] = f"{type(e).__name__}: {e}"
+        for future in pending:
+            errors[futures[future]] = f"timed out after {timeout}s"
+    finally:
+        # Don't hold the caller hostage to a hung request
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    # Keep the original tab order for callers that iterate the dict
+    dfs = {name: dfs[name] for name in sheet_links if name in dfs}
+    return dfs, errors
+
+
+def fetch_sheets_sequential(conn, sheet_links):
+    """Old one-after-another loader, kept as the benchmark baseline."""
+    dfs = {}
+    for name, link in sheet_links.items():
+        dfs[name] = clean_columns(conn.read(spreadsheet=link, ttl=0))
+    return dfs
+
+
+def timed(fn, *args, **kwargs):
+    """Runs fn and returns (result, seconds taken)."""
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+# --- LOCAL FILE SOURCE ---
+# Offline stand-in for GSheetsConnection: reads CSV / XLSX / Parquet exports
+# of the tabs (SITE_AVAIL.csv, 2G.xlsx, ...) from a directory, in chunks.
+LOCAL_DATA_DIR = os.environ.get("NETWORK_DATA_DIR", "")
+LOCAL_EXTENSIONS = (".parquet", ".csv", ".xlsx")
+CHUNK_ROWS = 50_000
+
+
+def local_sheet_links(directory):
+    """Maps each tab name to its export file (first extension found wins).
+
+    Tabs without an export map to a path that doesn't exist, so the fetch
+    reports them like any other broken tab.
+    """
+    links = {}
+    for name in SHEET_URL_KEYS:
+        links[name] = os.path.join(directory, name)
+        for ext in LOCAL_EXTENSIONS:
+            path = os.path.join(directory, name + ext)
+            if os.path.exists(path):
+                links[name] = path
+                break
+    return links
+
+
+class LocalFileConnection:
+    """Duck-types conn.read() over local export files.
+
+    Files are read in CHUNK_ROWS pieces with only the requested columns
+    parsed, so multi-hundred-MB exports load without Sheets row limits and
+    without holding a second full-width copy while parsing.
+    """
+
+    def __init__(self, chunk_rows=CHUNK_ROWS):
+        self.chunk_rows = chunk_rows
+
+    def read(self, spreadsheet=None, ttl=None, usecols=None, **kwargs):
+        ext = os.path.splitext(spreadsheet)[1].lower()
+        if ext == ".csv":
+            return self._read_csv(spreadsheet, usecols)
+        if ext == ".parquet":
+            return self._read_parquet(spreadsheet, usecols)
+        if ext == ".xlsx":
+            return self._read_xlsx(spreadsheet, usecols)
+        raise FileNotFoundError(f"No CSV/XLSX/Parquet export found at {spreadsheet}.*")
+
+    def _read_csv(self, path, usecols):
+        chunks = pd.read_csv(path, usecols=usecols, chunksize=self.chunk_rows)
+        return pd.concat(chunks, ignore_index=True)
+
+    def _read_parquet(self, path, usecols):
+        parquet = pq.ParquetFile(path)
+        names = parquet.schema_arrow.names
+        columns = [c for c in names if usecols(c)] if usecols else names
+        batches = parquet.iter_batches(batch_size=self.chunk_rows, columns=columns)
+        schema = pa.schema([parquet.schema_arrow.field(c) for c in columns])
+        return pa.Table.from_batches(batches, schema=schema).to_pandas()
+
+    def _read_xlsx(self, path, usecols):
+        from openpyxl import load_workbook  # only needed for Excel exports
+
+        book = load_workbook(path, read_only=True, data_only=True)
+        try:
+            rows = book.worksheets[0].iter_rows(values_only=True)
+            header = [c if c is not None else f"Unnamed: {i}" for i, c in enumerate(next(rows, ()))]
+            keep = [i for i, c in enumerate(header) if usecols is None or usecols(c)]
+            columns = [header[i] for i in keep]
+
+            chunks, batch = [], []
+            for row in rows:
+                if not any(v is not None for v in row):
+                    continue  # trailing blank rows
+                batch.append([row[i] if i < len(row) else None for i in keep])
+                if len(batch) >= self.chunk_rows:
+                    chunks.append(pd.DataFrame(batch, columns=columns))
+                    batch = []
+            chunks.append(pd.DataFrame(batch, columns=columns))
+        finally:
+            book.close()
+        # Let each column settle on one dtype across chunks, like read_csv would
+        return pd.concat(chunks, ignore_index=True).infer_objects()
+
+
+# --- LOCAL SNAPSHOT CACHE ---
+# One Parquet file per tab, named <TAB>-<content hash>.parquet, plus a
+# manifest.json that says which file is current for each tab.
+SNAPSHOT_DIR = os.environ.get("NETWORK_SNAPSHOT_DIR", ".snapshot")
+MANIFEST_NAME = "manifest.json"
+
+
+def content_hash(df):
+    """Stable fingerprint of a tab's columns and cell values."""
+    h = hashlib.sha1("\x1f".join(map(str, df.columns)).encode())
+    h.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return h.hexdigest()[:16]
+
+
+def _to_arrow(df):
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Sheets often mix numbers and text in one column; store those as text
+        df = df.copy()
+        for col in df.columns:
+            values = df[col]
+            if values.dtype == object or isinstance(values.dtype, pd.CategoricalDtype):
+                text = values.astype(object).where(values.isna(), values.astype(str))
+                df[col] = text.astype('category') if values.dtype == 'category' else text
+        return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def read_manifest(snapshot_dir=SNAPSHOT_DIR):
+    try:
+        with open(os.path.join(snapshot_dir, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_atomic(path, write):
+    """Writes `path` through a temporary file, then renames it into place.
+
+    The temporary name is unique per call, so processes sharing a directory
+    never write to (or clean up) each other's half-written files.
+    """
+    directory, base = os.path.split(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory or ".", prefix=base + ".", suffix=".tmp")
+    try:
+        os.fchmod(fd, 0o644)  # mkstemp's 0600 would hide it from other users' workers
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def snapshot_file(name, digest):
+    """File name of one version of a tab in the snapshot directory."""
+    return f"{name}-{digest}.parquet"
+
+
+def save_snapshot(dfs, snapshot_dir=SNAPSHOT_DIR, hashes=None):
+    """Writes each tab to Parquet and updates the manifest atomically.
+
+    Tabs missing from `dfs` (e.g. a failed fetch) keep their previous file.
+    Unchanged tabs are not rewritten. `hashes` can pass in content hashes
+    the caller already has. Returns the new manifest. Older files are left
+    for prune_snapshot, as models of the previous version may still read
+    them.
+    """
+    os.makedirs(snapshot_dir, exist_ok=True)
+    manifest = read_manifest(snapshot_dir)
+
+    now = time.time()
+    for name, df in dfs.items():
+        digest = (hashes or {}).get(name) or content_hash(df)
+        old = manifest.get(name)
+        if old and old["hash"] == digest:
+            old["checked_at"] = now
+            continue
+        file_name = snapshot_file(name, digest)
+        table = _to_arrow(df)
+        _write_atomic(os.path.join(snapshot_dir, file_name), lambda f: pq.write_table(table, f))
+        manifest[name] = {"file": file_name, "hash": digest, "saved_at": now, "checked_at": now}
+
+    text = json.dumps(manifest, indent=2).encode()
+    _write_atomic(os.path.join(snapshot_dir, MANIFEST_NAME), lambda f: f.write(text))
+    return manifest
+
+
+def prune_snapshot(snapshot_dir=SNAPSHOT_DIR, *generations, before=None):
+    """Deletes the Parquet files of every version not in `generations`.
+
+    Each generation is a {tab: hash} dict; the manifest's files are always
+    kept. With `before` (a timestamp, e.g. of this process's previous save)
+    only files last written earlier go, along with temporary files left
+    behind by crashed writers: other processes sharing the directory may
+    still be using anything newer.
+    """
+    keep = {entry["file"] for entry in read_manifest(snapshot_dir).values()}
+    keep.update(snapshot_file(name, digest) for versions in generations for name, digest in versions.items())
+    for file_name in os.listdir(snapshot_dir):
+        path = os.path.join(snapshot_dir, file_name)
+        try:
+            if file_name.endswith(".tmp"):
+                stale = before is not None and os.path.getmtime(path) < before
+            else:
+                stale = (file_name.endswith(".parquet") and file_name not in keep
+                         and (before is None or os.path.getmtime(path) < before))
+            if stale:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+def load_snapshot(snapshot_dir=SNAPSHOT_DIR, columns=None):
+    """Reads every tab in the manifest with memory-mapped Parquet reads.
+
+    `columns(names)` can pick the columns to read from each tab's header.
+    Returns (dfs, manifest), or (None, {}) when there is no usable snapshot.
+    """
+    manifest = read_manifest(snapshot_dir)
+    if not manifest:
+        return None, {}
+    dfs = {}
+    try:
+        for name in SHEET_URL_KEYS:
+            if name in manifest:
+                path = os.path.join(snapshot_dir, manifest[name]["file"])
+                selected = columns(pq.read_schema(path).names) if columns else None
+                dfs[name] = pq.read_table(path, columns=selected, memory_map=True).to_pandas()
+    except (OSError, pa.ArrowException):
+        return None, {}
+    return dfs, manifest
+
+
+def snapshot_age(manifest):
+    """Seconds since the least recently fetched tab was last checked."""
+    if not manifest:
+        return float("inf")
+    return time.time() - min(entry["checked_at"] for entry in manifest.values())
+
+
+# --- BACKGROUND REFRESH ---
+@dataclass
+class NetworkData:
+    """One complete version of the tabs, swapped in as a whole."""
+    dfs: dict
+    errors: dict      # tab -> why it wasn't refreshed this time
+    versions: dict    # tab -> content hash
+    models: dict = None
+    loaded_at: float = 0.0
+
+
+class NetworkDataStore:
+    """Holds the current NetworkData and reloads it on a background thread.
+
+    Readers always get the last complete version (stale-while-revalidate):
+    a refresh fetches, snapshots and prepares the next version off to the
+    side, then swaps it in with a single assignment. `fetch(held_dfs)` must
+    return (dfs, errors); `prepare(dfs, versions, previous)` builds the
+    derived models, reusing whatever `previous` has for unchanged tabs.
+    `on_update(data)` is called after every swap, `on_error(message,
+    failed_at)` after every failed refresh; `last_error` stays set until
+    the next successful one. With `metrics` (a
+    StageMetrics), each refresh records its fetch/snapshot/normalize times.
+    With `keep_raw=False` the raw tabs are not held once they are in the
+    snapshot (data.dfs is left empty): startup reads only the hot columns,
+    and each refresh takes the held copy back from the snapshot.
+    """
+
+    def __init__(self, fetch, prepare=None, interval=15 * 60, retry_interval=60,
+                 snapshot_dir=SNAPSHOT_DIR, on_update=None, on_error=None, metrics=None, keep_raw=True):
+        self.fetch = fetch
+        self.prepare = prepare
+        self.keep_raw = keep_raw
+        self.on_update = on_update
+        self.on_error = on_error
+        self.metrics = metrics
+        self.interval = interval
+        self.retry_interval = retry_interval
+        self.snapshot_dir = snapshot_dir
+        self.last_error = None
+        self.failed_at = None
+        self._saved_at = 0  # start of our last snapshot save; nothing is pruned before one
+        self._current = None
+        self._attempted = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Serves the local snapshot (if any) and starts the refresh thread."""
+        delay = 0
+        dfs, manifest = load_snapshot(self.snapshot_dir, columns=None if self.keep_raw else hot_columns)
+        if dfs and MASTER_TAB in dfs:
+            versions = {name: manifest[name]["hash"] for name in dfs}
+            loaded_at = min(manifest[name]["checked_at"] for name in dfs)
+            self._swap(NetworkData(dfs, {}, versions, loaded_at=loaded_at))
+            self._attempted.set()
+            delay = max(0, self.interval - snapshot_age(manifest))
+
+        self._thread = threading.Thread(
+            target=self._run, args=(delay,), name="network-data-refresh", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def current(self, timeout=None):
+        """The latest complete version. Only blocks before the first load."""
+        self._attempted.wait(timeout)
+        data = self._current
+        if data is None:
+            raise RuntimeError(self.last_error or "Timed out waiting for the network sheets")
+        return data
+
+    def refresh(self):
+        """Fetches a new version and swaps it in. Runs on the refresh thread."""
+        previous = self._current
+        timer = StageTimer("refresh")
+        with timer.stage("fetch"):
+            held, held_versions = self._held(previous)
+            dfs, errors = self.fetch(held)
+        if MASTER_TAB not in dfs:
+            raise RuntimeError(f"{MASTER_TAB} sheet failed to load: {errors.get(MASTER_TAB)}")
+        known = {}
+        if held:
+            # A tab that failed this time keeps serving its last good copy
+            for name, old_df in held.items():
+                if name not in dfs:
+                    dfs[name] = old_df
+                    known[name] = held_versions[name]
+            dfs = {name: dfs[name] for name in SHEET_URL_KEYS if name in dfs}
+
+        with timer.stage("snapshot"):
+            # Fingerprint each tab once; it drives both the snapshot and the rebuild
+            versions = {name: known.get(name) or content_hash(df) for name, df in dfs.items()}
+            saved = True
+            saved_at = time.time()
+            try:
+                save_snapshot(dfs, self.snapshot_dir, hashes=versions)
+            except OSError as e:
+                # A read-only disk only costs us the fast restart, not the dashboard
+                # (and the raw tabs stay in memory, as nothing else holds them)
+                logger.warning("Could not write snapshot: %s", e)
+                saved = False
+        self._swap(NetworkData(dfs, errors, versions, loaded_at=time.time()), timer, saved)
+        if saved:
+            # Only now: until the swap, readers hold models of `previous`, whose
+            # cold columns are read from its files. One generation back is kept
+            # for models still in use by a rerun (or a follower catching up), and
+            # anything written since our previous save, which may be another
+            # replica's if the directory is shared.
+            prune_snapshot(self.snapshot_dir, versions, previous.versions if previous else {}, before=self._saved_at)
+            self._saved_at = saved_at
+        if self.metrics is not None:
+            self.metrics.record(timer)
+
+    def _held(self, previous):
+        """The raw tabs of the current version and their hashes, for the next fetch."""
+        if previous is None:
+            return None, {}
+        if previous.dfs:
+            return previous.dfs, previous.versions
+        dfs, manifest = load_snapshot(self.snapshot_dir)
+        if not dfs:
+            return None, {}
+        return dfs, {name: manifest[name]["hash"] for name in dfs}
+
+    def _swap(self, data, timer=None, in_snapshot=True):
+        timer = timer or StageTimer("refresh")
+        if self.prepare is not None:
+            with timer.stage("normalize"):
+                data.models = self.prepare(data.dfs, data.versions, self._current)
+        if in_snapshot and not self.keep_raw:
+            data.dfs = {}
+        self._current = data
+        if self.on_update is not None:
+            self.on_update(data)
+
+    def _run(self, delay):
+        while True:
+            time.sleep(delay)
+            try:
+                self.refresh()
+                self.last_error = None
+                delay = self.interval
+            except Exception as e:
+                logger.exception("Network data refresh failed")
+                self.last_error = f"{type(e).__name__}: {e}"
+                self.failed_at = time.time()
+                delay = self.retry_interval if self._current is None else self.interval
+                if self.on_error is not None:
+                    try:
+                        self.on_error(self.last_error, self.failed_at)
+                    except Exception:
+                        logger.exception("Could not report the refresh failure")
+            finally:
+                self._attempted.set()
+
+
+# --- NORMALIZED DATA MODEL ---
+# Built once per data version; reruns only slice it.
+FILTER_COLS = ["REGION", "TGL", "NEW USF SITES", "REVENUE CAT"]
+# Filters whose options narrow to the values seen with the parent's selection
+FILTER_PARENTS = {"TGL": "REGION"}
+# Tab whose rows define the master site index the other tabs are aligned to
+MASTER_TAB = "AVAILABILITY"
+
+
+@dataclass
+class SheetSchema:
+    """Column classes of a tab, worked out once per data version."""
+    date_cols: list    # daily 'YYYY-MM-DD' columns, oldest to newest
+    dates: np.ndarray  # the same days as datetime64 (NaT if unparseable)
+    tch_cols: list     # monthly '<MON> TCH%' columns, in sheet order
+    fuel_cols: list    # '(FUEL)' columns, in sheet order
+    kpi_cols: list     # all of the above, in sheet order
+    date_labels: np.ndarray = None  # chart axis label per date column ('25-Jan')
+
+
+def axis_label(col):
+    """Short chart label for a non-date column ('JAN TCH%' -> 'JAN')."""
+    return str(col).replace(' TCH%', '').split(' (FUEL)')[0]
+
+
+def classify_columns(columns):
+    """Builds a SheetSchema with vectorized string checks over the header."""
+    cols = pd.Index([str(c) for c in columns], dtype=object)
+    is_date = np.asarray(cols.str.match(r'\d'), dtype=bool) & np.asarray(cols.str.contains('-', regex=False), dtype=bool)
+    is_tch = np.asarray(cols.str.contains('TCH%', regex=False), dtype=bool)
+    is_fuel = np.asarray(cols.str.contains('(FUEL)', regex=False), dtype=bool)
+    is_date &= ~(is_tch | is_fuel)  # e.g. '1-JAN (FUEL)' is not a daily column
+
+    date_cols = cols[is_date]
+    dates = pd.to_datetime(date_cols, format='%Y-%m-%d', errors='coerce').to_numpy()
+    order = np.argsort(dates, kind='stable')  # NaT sorts last
+    date_cols, dates = date_cols[order], dates[order]
+
+    # Axis labels are worked out here once, so building a chart parses nothing
+    date_labels = pd.DatetimeIndex(dates).strftime('%d-%b').to_numpy(dtype=object)
+    unparsed = pd.isna(dates)
+    date_labels[unparsed] = [axis_label(c) for c in date_cols[unparsed]]
+
+    return SheetSchema(
+        date_cols=date_cols.tolist(),
+        dates=dates,
+        tch_cols=cols[is_tch].tolist(),
+        fuel_cols=cols[is_fuel].tolist(),
+        kpi_cols=cols[is_date | is_tch | is_fuel].tolist(),
+        date_labels=date_labels,
+    )
+
+
+@dataclass
+class SheetModel:
+    """One tab split into typed site metadata and a float32 KPI matrix.
+
+    Rows of `meta` and `kpi` line up with the rows of the raw tab.
+    `master_pos` gives each row's position in the master (AVAILABILITY)
+    tab, -1 for sites the master doesn't have; None if the tab has no SID.
+    With `cold`, meta and kpi hold only the hot columns and `schema`
+    describes every column; read KPI values through kpi_block().
+    """
+    name: str
+    meta: pd.DataFrame  # SID as text, filter dimensions as categoricals
+    kpi: pd.DataFrame   # float32, index = SID, columns = date / TCH% / (FUEL)
+    index: "FilterIndex" = None
+    master_pos: np.ndarray = None
+    schema: SheetSchema = None
+    cube: "RollupCube" = None
+    cold: "ColdColumns" = None
+    sids: "SidIndex" = None
+
+
+class FilterIndex:
+    """Packed bitsets over the rows of a tab, one per filter value.
+
+    Any combination of sidebar filters resolves with a handful of
+    vectorized OR (within a column) and AND (across columns) operations
+    on the packed bytes, without touching the frame. The sidebar's option
+    lists come from here too, built once from the categorical dtypes.
+    """
+
+    def __init__(self, meta, columns=FILTER_COLS, parents=FILTER_PARENTS):
+        self.n_rows = len(meta)
+        self.all_rows = np.packbits(np.ones(self.n_rows, dtype=bool))
+        self.bitsets = {}
+        self.options = {}  # column -> sorted values that occur, for the sidebar
+        codes = {}
+        for col in columns:
+            if col not in meta.columns:
+                continue
+            values = meta[col].astype('category')
+            codes[col] = values.cat.codes.to_numpy()
+            self.bitsets[col] = {
+                value: np.packbits(codes[col] == code)
+                for code, value in enumerate(values.cat.categories)
+            }
+            used = np.bincount(codes[col][codes[col] >= 0], minlength=len(values.cat.categories)) > 0
+            self.options[col] = sorted(values.cat.categories[used].tolist())
+
+        # Which child values occur with each parent value (e.g. TGLs per REGION),
+        # columns in the child's option order
+        self.cooccurs = {}
+        for col, parent in parents.items():
+            if col in codes and parent in codes:
+                both = (codes[col] >= 0) & (codes[parent] >= 0)
+                seen = np.zeros((len(self.bitsets[parent]), len(self.bitsets[col])), dtype=bool)
+                seen[codes[parent][both], codes[col][both]] = True
+                child_codes = {value: code for code, value in enumerate(self.bitsets[col])}
+                parent_codes = {value: code for code, value in enumerate(self.bitsets[parent])}
+                seen = seen[:, [child_codes[v] for v in self.options[col]]]
+                self.cooccurs[col] = (parent, parent_codes, seen)
+
+    def options_for(self, col, filters=None):
+        """Sorted choices for a filter, narrowed by its parent's selection.
+
+        Columns the tab doesn't have get no choices.
+        """
+        options = self.options.get(col, [])
+        if col not in self.cooccurs or not filters:
+            return options
+        parent, parent_codes, seen = self.cooccurs[col]
+        selected = [parent_codes[v] for v in filters.get(parent) or [] if v in parent_codes]
+        if not selected:
+            return options
+        return [v for v, keep in zip(options, seen[selected].any(axis=0)) if keep]
+
+    def resolve(self, filters):
+        """Packed bitset of rows matching {column: selected values}.
+
+        Empty selections and columns this tab doesn't have are skipped.
+        """
+        bits = self.all_rows
+        for col, selected in filters.items():
+            if not selected or col not in self.bitsets:
+                continue
+            col_bits = np.zeros_like(self.all_rows)
+            for value in selected:
+                value_bits = self.bitsets[col].get(value)
+                if value_bits is not None:
+                    col_bits |= value_bits
+            bits = bits & col_bits
+        return bits
+
+    def mask(self, filters):
+        return np.unpackbits(self.resolve(filters), count=self.n_rows).astype(bool)
+
+
+class SidIndex:
+    """Sorted SIDs of a tab, with their row positions.
+
+    A SID's rows are found with one dict lookup, and the typeahead search
+    returns the first `k` matches without sorting or casting anything.
+    """
+
+    def __init__(self, sids):
+        sids = np.asarray(sids, dtype=str)  # fixed-width strings sort far faster than objects
+        self.order = np.argsort(sids, kind='stable')
+        self.sids, starts = np.unique(sids[self.order], return_index=True)
+        self.starts = np.append(starts, len(sids))
+        names = self.sids.tolist()
+        self.slots = dict(zip(names, range(len(names))))
+
+        # Search runs on upper-cased keys in their own sorted order, joined
+        # into one string for substring search; offsets map hits back to keys
+        self.text = "\n".join(names)
+        self.keys, self.key_sids = self.sids, self.sids
+        upper = self.text.upper()
+        if upper != self.text:
+            keys = np.asarray(upper.split("\n"), dtype=str)
+            key_order = np.argsort(keys, kind='stable')
+            self.keys, self.key_sids = keys[key_order], self.sids[key_order]
+            self.text = "\n".join(self.keys.tolist())
+        lengths = np.fromiter(map(len, self.text.split("\n")), dtype=np.int64, count=len(names))
+        self.offsets = np.concatenate([[0], np.cumsum(lengths + 1)])
+
+    def __len__(self):
+        return len(self.sids)
+
+    def rows(self, sid):
+        """Row positions holding `sid`, in sheet order (empty if unknown)."""
+        slot = self.slots.get(sid)
+        if slot is None:
+            return np.empty(0, dtype=np.intp)
+        return np.sort(self.order[self.starts[slot]:self.starts[slot + 1]])
+
+    def search(self, query, k=50):
+        """Up to `k` SIDs containing `query` (case-insensitive), prefix matches first."""
+        query = str(query).strip().upper()
+        if not query:
+            return self.sids[:k].tolist()
+        start = int(np.searchsorted(self.keys, query))
+        end = start
+        while end < len(self.keys) and end - start < k and self.keys[end].startswith(query):
+            end += 1
+        matches = self.key_sids[start:end].tolist()
+
+        # Then substring matches, scanning the joined text until k are found
+        at = self.text.find(query)
+        while at >= 0 and len(matches) < k:
+            i = int(np.searchsorted(self.offsets, at, side='right')) - 1
+            if not start <= i < end:
+                matches.append(str(self.key_sids[i]))
+            at = self.text.find(query, self.offsets[i + 1]) if i + 1 < len(self.keys) else -1
+        return matches
+
+
+# --- HOT / COLD COLUMNS ---
+# Most reruns only touch SID, the filter dimensions and the last few weeks.
+# Those stay in memory; site details, FUEL and older days stay in the tab's
+# snapshot Parquet file and are read the first time something asks.
+HOT_DAYS = 30  # widest Display Range
+HOT_META = ["SID"] + FILTER_COLS
+
+
+def hot_columns(columns):
+    """SID, filter dimensions, the last HOT_DAYS days and the TCH% months."""
+    schema = classify_columns(columns)
+    hot = set(HOT_META) | set(schema.date_cols[-HOT_DAYS:]) | set(schema.tch_cols)
+    return [c for c in columns if c in hot]
+
+
+def snapshot_columns(snapshot_dir, name):
+    """Header of a tab's current snapshot file."""
+    entry = read_manifest(snapshot_dir)[name]
+    return pq.read_schema(os.path.join(snapshot_dir, entry["file"])).names
+
+
+class ColdColumns:
+    """The columns of a tab that live in its snapshot file, read on demand.
+
+    The file of the model's `version` holds the model's rows, so it is read
+    by position while it exists (refreshes keep one previous version). Once
+    it is pruned, reads come from the current snapshot and line rows up by
+    SID (`sids`) and occurrence number, so repeated SIDs keep their own
+    values; sites it no longer has come out blank. The last `maxsize` KPI
+    columns and site rows read are kept.
+    """
+
+    def __init__(self, snapshot_dir, name, columns, sids=None, version=None, maxsize=64):
+        self.snapshot_dir = snapshot_dir
+        self.name = name
+        self.columns = list(columns)  # every column of the tab, hot and cold
+        self.sids = sids
+        self.version = version
+        self.maxsize = maxsize
+        self._kpi = OrderedDict()   # column -> float32 values per model row
+        self._rows = OrderedDict()  # (position, columns) -> pd.Series
+        self._lock = threading.Lock()
+
+    def read(self, cols):
+        """DataFrame of `cols` with one row per model row."""
+        if self.version is not None:
+            try:
+                return self._read(os.path.join(self.snapshot_dir, snapshot_file(self.name, self.version)), cols, True)
+            except FileNotFoundError:
+                pass
+        entry = read_manifest(self.snapshot_dir).get(self.name)
+        if entry is None:
+            raise FileNotFoundError(f"No snapshot of the {self.name} tab")
+        path = os.path.join(self.snapshot_dir, entry["file"])
+        return self._read(path, cols, entry["hash"] == self.version)
+
+    def _read(self, path, cols, same_rows):
+        names = set(pq.read_schema(path).names)
+        by_sid = not same_rows and self.sids is not None and 'SID' in names
+        selected = [c for c in cols if c in names and c != 'SID'] + (['SID'] if by_sid else [])
+        df = pq.read_table(path, columns=selected, memory_map=True).to_pandas()
+        if by_sid:
+            # A newer snapshot: the n-th row of a SID there is its n-th row here
+            sids = df.pop('SID').astype(str)
+            df = df.set_axis(_occurrence_keys(sids)).reindex(_occurrence_keys(pd.Series(self.sids)))
+        return df.reset_index(drop=True).reindex(columns=cols)
+
+    def kpi(self, cols):
+        """float32 [rows x cols] block of KPI columns."""
+        with self._lock:
+            missing = [c for c in cols if c not in self._kpi]
+            if missing:
+                df = self.read(missing)
+                for col in missing:
+                    self._kpi[col] = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=np.float32)
+            block = np.column_stack([self._kpi[col] for col in cols])
+            for col in cols:
+                self._kpi.move_to_end(col)
+            while len(self._kpi) > self.maxsize:
+                self._kpi.popitem(last=False)
+        return block
+
+    def row(self, position, cols):
+        """One model row of `cols` as a Series."""
+        key = (position, tuple(cols))
+        with self._lock:
+            if key not in self._rows:
+                self._rows[key] = self.read(cols).iloc[position]
+            self._rows.move_to_end(key)
+            while len(self._rows) > self.maxsize:
+                self._rows.popitem(last=False)
+            return self._rows[key]
+
+    def clear(self):
+        """Forgets the columns and rows read so far."""
+        with self._lock:
+            self._kpi.clear()
+            self._rows.clear()
+
+
+def _occurrence_keys(sids):
+    """(SID, n-th time it appears) per row, unique even with repeated SIDs."""
+    return pd.MultiIndex.from_arrays([sids.to_numpy(), sids.groupby(sids).cumcount().to_numpy()])
+
+
+def kpi_block(sheet, cols, rows=None):
+    """float32 [rows x cols] block of a tab's KPI values.
+
+    `rows` is a boolean mask or row positions (None: every row). Hot
+    columns are sliced out of the in-memory matrix; cold ones come from
+    the snapshot (blank if the tab has no cold store).
+    """
+    values = sheet.kpi.to_numpy()
+    idx = sheet.kpi.columns.get_indexer(cols)
+    hot = idx >= 0
+    if hot.all():
+        return values[:, idx] if rows is None else values[np.ix_(rows, idx)]
+
+    n_rows = len(values) if rows is None else len(values[rows])
+    block = np.full((n_rows, len(cols)), np.nan, dtype=np.float32)
+    block[:, hot] = values[:, idx[hot]] if rows is None else values[np.ix_(rows, idx[hot])]
+    if sheet.cold is not None:
+        cold = sheet.cold.kpi([col for col, h in zip(cols, hot) if not h])
+        block[:, ~hot] = cold if rows is None else cold[rows]
+    return block
+
+
+def site_details(sheet, position):
+    """Every metadata column of one row: hot ones from memory, the rest from disk."""
+    row = sheet.meta.iloc[position]
+    if sheet.cold is None:
+        return row
+    kpi_cols = set(sheet.schema.kpi_cols)
+    cold_meta = [c for c in sheet.cold.columns if c not in row.index and c not in kpi_cols]
+    return pd.concat([row, sheet.cold.row(position, cold_meta)]) if cold_meta else row
+
+
+def normalize_sheet(name, df, snapshot_dir=None, version=None):
+    """Types one tab into a SheetModel.
+
+    With `snapshot_dir` (whose manifest holds `version` of the tab) only
+    the hot columns are kept in memory; `df` may already be just those.
+    """
+    columns = snapshot_columns(snapshot_dir, name) if snapshot_dir else list(df.columns)
+    schema = classify_columns(columns)
+    if snapshot_dir:
+        df = df[[c for c in hot_columns(columns) if c in df.columns]]
+    kpi_cols = [c for c in schema.kpi_cols if c in df.columns]
+    meta = df.drop(columns=kpi_cols)
+    if 'SID' in meta.columns:
+        meta['SID'] = meta['SID'].astype(str)
+
+    for col in meta.columns:
+        if col == 'SID' or pd.api.types.is_numeric_dtype(meta[col]):
+            continue
+        # Filter dimensions always, other text columns when values repeat a lot
+        if col in FILTER_COLS or meta[col].nunique() <= len(meta) // 2:
+            meta[col] = meta[col].astype('category')
+
+    # One float32 block, so kpi.to_numpy() is a view and slicing rows or
+    # columns out of it never copies the whole matrix first
+    values = df[kpi_cols].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=np.float32)
+    kpi = pd.DataFrame(values, columns=kpi_cols, copy=False)
+    return assemble_sheet(name, meta, kpi, schema, snapshot_dir, columns, version)
+
+
+def assemble_sheet(name, meta, kpi, schema=None, snapshot_dir=None, columns=None, version=None):
+    """SheetModel from already normalized metadata and KPI matrix.
+
+    With `snapshot_dir`, the tab's other `columns` are served from there
+    (`version` is the content hash the rows were built from).
+    """
+    kpi.index = pd.Index(meta['SID'] if 'SID' in meta.columns else meta.index, name='SID')
+    schema = schema or classify_columns(columns or kpi.columns)
+    cold = None
+    if snapshot_dir:
+        sids = meta['SID'].to_numpy(dtype=object) if 'SID' in meta.columns else None
+        cold = ColdColumns(snapshot_dir, name, columns, sids, version)
+    sids = SidIndex(meta['SID']) if 'SID' in meta.columns else None
+    return SheetModel(name, meta, kpi, FilterIndex(meta), schema=schema, cold=cold, sids=sids)
+
+
+def build_network_model(tech_dfs, versions=None, previous=None, snapshot_dir=None):
+    """Normalizes every loaded tab. Returns {tab name: SheetModel}.
+
+    With the tab `versions` (content hashes) and the `previous` NetworkData,
+    only tabs whose fingerprint moved are rebuilt. Unchanged tabs reuse
+    their model; when only the master tab changed they keep their
+    normalized data and just get re-aligned and re-rolled up. With
+    `snapshot_dir`, tabs whose snapshot holds this very version keep only
+    their hot columns in memory.
+    """
+    manifest = read_manifest(snapshot_dir) if snapshot_dir and versions else {}
+    loaders = {}
+    for name, df in tech_dfs.items():
+        on_disk = name in manifest and manifest[name]["hash"] == versions.get(name)
+        if on_disk:
+            loaders[name] = partial(normalize_sheet, name, df, snapshot_dir, versions[name])
+        else:
+            loaders[name] = partial(normalize_sheet, name, df)
+    return _build_models(loaders, versions, previous)
+
+
+def _build_models(loaders, versions, previous):
+    """Calls loaders[name]() for changed tabs, then aligns and rolls them up."""
+    unchanged = {}
+    if versions and previous is not None and previous.models:
+        unchanged = {
+            name: previous.models[name] for name in loaders
+            if name in previous.models and previous.versions.get(name) == versions.get(name)
+        }
+    master_unchanged = MASTER_TAB in unchanged
+
+    models, rebuild = {}, []
+    for name, load in loaders.items():
+        if name in unchanged and master_unchanged:
+            models[name] = unchanged[name]
+            continue
+        if name in unchanged:
+            models[name] = replace(unchanged[name], master_pos=None, cube=None)
+        else:
+            models[name] = load()
+        rebuild.append(name)
+    if previous is not None:
+        logger.info("Rebuilt models for %s", ", ".join(rebuild) or "no tabs")
+
+    master = models.get(MASTER_TAB)
+    for name in rebuild:
+        sheet = models[name]
+        if master is not None and 'SID' in master.meta.columns:
+            align_to_master(sheet, master)
+        sheet.cube = RollupCube(sheet.kpi, filter_dimensions(sheet, master), cold=sheet.cold)
+    return models
+
+
+def align_to_master(sheet, master):
+    """Sets sheet.master_pos by looking each row's SID up in the master tab."""
+    if 'SID' not in sheet.meta.columns:
+        return
+    master_sids = master.meta['SID']
+    first = ~master_sids.duplicated().to_numpy()  # duplicate SIDs map to their first row
+    lookup = pd.Index(master_sids[first]).get_indexer(sheet.meta['SID'])
+    sheet.master_pos = np.where(lookup >= 0, np.flatnonzero(first)[lookup], -1)
+
+
+def align_mask(sheet, master_mask):
+    """Carries a mask over the master tab's rows onto this tab's rows.
+
+    Rows whose SID is not in the master tab are left out.
+    """
+    pos = sheet.master_pos
+    if len(master_mask) == 0:
+        return np.zeros(len(pos), dtype=bool)
+    return (pos >= 0) & master_mask[np.maximum(pos, 0)]
+
+
+def filter_mask(sheet, sid=None, filters=None):
+    """Boolean row mask for a SID and {column: selected values} filters.
+
+    Filters on columns the tab doesn't have are skipped.
+    """
+    mask = sheet.index.mask(filters or {})
+    if sid is not None and sheet.sids is not None:
+        # Index lookup of the SID's rows instead of comparing every SID
+        rows = sheet.sids.rows(sid)
+        keep = np.zeros_like(mask)
+        keep[rows] = mask[rows]
+        return keep
+    return mask
+
+
+def kpi_means(sheet, cols, mask=None):
+    """Average of each KPI column over the masked rows (NaN when empty).
+
+    `mask` is a boolean mask or an array of row positions. Only the
+    selected rows x columns are copied out of the KPI matrix.
+    """
+    block = kpi_block(sheet, cols, mask)
+    valid = ~np.isnan(block)
+    # Sum in float64 so float32 storage doesn't cost precision
+    sums = np.where(valid, block, 0).sum(axis=0, dtype=np.float64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = sums / valid.sum(axis=0)
+    return pd.Series(means, index=cols)
+
+
+# --- ROLLUP CUBE ---
+def filter_dimensions(sheet, master=None):
+    """Filter columns as categoricals lined up with the sheet's rows.
+
+    Aligned tabs take their values from the master tab (sites the master
+    doesn't have come out blank); other tabs use their own columns.
+    """
+    if sheet.master_pos is None or master is None:
+        return {col: pd.Categorical(sheet.meta[col]) for col in FILTER_COLS if col in sheet.meta.columns}
+    dims = {}
+    pos = sheet.master_pos
+    for col in FILTER_COLS:
+        if col in master.meta.columns:
+            values = master.meta[col].astype('category')
+            codes = np.where(pos >= 0, values.cat.codes.to_numpy()[np.maximum(pos, 0)], -1)
+            dims[col] = pd.Categorical.from_codes(codes, values.cat.categories)
+    return dims
+
+
+class RollupCube:
+    """Per-column KPI sum and count for every filter combination of a tab.
+
+    Averages for any REGION/TGL/NEW USF SITES/REVENUE CAT selection are
+    answered by adding up the matching cells, so the cost depends on the
+    number of combinations rather than the number of sites. Columns of the
+    `cold` store are rolled up the first time they are asked for.
+    """
+
+    def __init__(self, kpi, dims, cold=None):
+        self.dims = list(dims)
+        self.cold = cold
+        self.categories = {col: pd.Index(dims[col].categories) for col in self.dims}
+        self.columns = pd.Index(kpi.columns)
+
+        if self.dims:
+            codes = np.column_stack([np.asarray(dims[col].codes) for col in self.dims])
+            self.groups, inverse = np.unique(codes, axis=0, return_inverse=True)
+            inverse = inverse.reshape(-1)
+        else:
+            self.groups = np.zeros((1, 0), dtype=np.int8)
+            inverse = np.zeros(len(kpi), dtype=np.intp)
+        self.inverse = inverse
+        self._cold_sums = {}  # column -> (sums, counts) per group
+
+        values = kpi.to_numpy()
+        valid = ~np.isnan(values)
+        grouped = pd.DataFrame(np.where(valid, values, 0), dtype=np.float64).groupby(inverse)
+        self.sums = grouped.sum().reindex(range(len(self.groups)), fill_value=0).to_numpy()
+        self.counts = pd.DataFrame(valid, dtype=np.float64).groupby(inverse).sum().reindex(
+            range(len(self.groups)), fill_value=0).to_numpy()
+
+    def group_mask(self, filters):
+        keep = np.ones(len(self.groups), dtype=bool)
+        for d, col in enumerate(self.dims):
+            selected = filters.get(col)
+            if selected:
+                codes = self.categories[col].get_indexer(selected)
+                keep &= np.isin(self.groups[:, d], codes[codes >= 0])
+        return keep
+
+    def means(self, filters, cols):
+        """Average of each KPI column over the sites matching `filters`."""
+        keep = self.group_mask(filters).astype(np.float64)
+        idx = self.columns.get_indexer(cols)
+        if (idx >= 0).all():
+            sums = keep @ self.sums[:, idx]
+            counts = keep @ self.counts[:, idx]
+        else:
+            sums = np.zeros(len(cols))
+            counts = np.zeros(len(cols))
+            hot = idx >= 0
+            sums[hot] = keep @ self.sums[:, idx[hot]]
+            counts[hot] = keep @ self.counts[:, idx[hot]]
+            cold_cols = [col for col, h in zip(cols, hot) if not h]
+            cold_sums = self._cold_columns(cold_cols)
+            for i in np.flatnonzero(~hot):
+                col_sums, col_counts = cold_sums[cols[i]]
+                sums[i], counts[i] = keep @ col_sums, keep @ col_counts
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return pd.Series(sums / counts, index=cols)
+
+    def clear_cold(self):
+        """Forgets the rolled up cold columns (and the cold store's reads)."""
+        self._cold_sums = {}
+        if self.cold is not None:
+            self.cold.clear()
+
+    def _cold_columns(self, cols):
+        """{column: (group sums, group counts)} of columns that aren't in memory.
+
+        Columns not rolled up yet are read from the cold store in one go.
+        """
+        n_groups = len(self.groups)
+        missing = [col for col in dict.fromkeys(cols) if col not in self._cold_sums]
+        if missing:
+            block = self.cold.kpi(missing) if self.cold is not None else None
+            for j, col in enumerate(missing):
+                if block is None:
+                    self._cold_sums[col] = (np.zeros(n_groups), np.zeros(n_groups))
+                    continue
+                values = block[:, j]
+                valid = ~np.isnan(values)
+                self._cold_sums[col] = (
+                    np.bincount(self.inverse, weights=np.where(valid, values, 0), minlength=n_groups),
+                    np.bincount(self.inverse, weights=valid, minlength=n_groups),
+                )
+        return {col: self._cold_sums[col] for col in cols}
+
+
+# --- SHARED AGGREGATE CACHE ---
+def filter_key(sid, filters):
+    """Hashable, order-independent form of the sidebar selections."""
+    return (sid,) + tuple(
+        (col, tuple(sorted(set(selected), key=str)))
+        for col, selected in sorted(filters.items()) if selected
+    )
+
+
+class AggregateCache:
+    """Size-bounded LRU of computed aggregates, safe to share across sessions.
+
+    Keep one per process (st.cache_resource) so concurrent users reuse each
+    other's results. Cached values are shared: treat them as read-only.
+    """
+
+    def __init__(self, maxsize=512):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return self._entries[key]
+            self.misses += 1
+
+        # Computed outside the lock; two sessions racing on a miss both compute
+        value = compute()
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+            }
+
+
+# --- SHARED CACHE FOR SEVERAL WORKERS ON ONE HOST ---
+# The leader process publishes each tab's normalized data to a RAM-backed
+# directory: metadata as an Arrow IPC file, the float32 KPI matrix as .npy.
+# Other workers memory-map them, so the big matrix exists once per host.
+SHARED_DIR = os.environ.get("NETWORK_SHARED_DIR", "")
+SHARED_MANIFEST = "shared.json"
+REFRESH_ERROR = "refresh_error.json"
+LEADER_LOCK = "leader.lock"
+
+
+def publish_models(data, shared_dir):
+    """Writes the tabs of a NetworkData for follower workers to attach."""
+    os.makedirs(shared_dir, exist_ok=True)
+    tabs = {}
+    for name, sheet in data.models.items():
+        base = f"{name}-{data.versions[name]}"
+        meta_file, kpi_file = base + ".arrow", base + ".npy"
+        if not os.path.exists(os.path.join(shared_dir, kpi_file)):
+            table = _to_arrow(sheet.meta)
+            _write_atomic(os.path.join(shared_dir, meta_file), lambda f: _write_ipc(f, table))
+            kpi = np.ascontiguousarray(sheet.kpi.to_numpy(dtype=np.float32))
+            _write_atomic(os.path.join(shared_dir, kpi_file), lambda f: np.save(f, kpi))
+        tabs[name] = {
+            "hash": data.versions[name],
+            "meta": meta_file,
+            "kpi": kpi_file,
+            "kpi_cols": list(sheet.kpi.columns),
+            # Followers read cold columns from the leader's snapshot
+            "cold_dir": os.path.abspath(sheet.cold.snapshot_dir) if sheet.cold else None,
+            "columns": sheet.cold.columns if sheet.cold else None,
+        }
+
+    manifest = {"tabs": tabs, "errors": data.errors, "loaded_at": data.loaded_at}
+    _write_atomic(
+        os.path.join(shared_dir, SHARED_MANIFEST),
+        lambda f: f.write(json.dumps(manifest).encode())
+    )
+
+    # Workers that still map an old file keep their pages until they let go
+    current = {entry[key] for entry in tabs.values() for key in ("meta", "kpi")}
+    for file_name in os.listdir(shared_dir):
+        if file_name.endswith((".arrow", ".npy")) and file_name not in current:
+            try:
+                os.remove(os.path.join(shared_dir, file_name))
+            except OSError:
+                pass
+
+
+def publish_refresh_error(shared_dir, error, failed_at):
+    """Tells follower workers that the leader's last refresh failed."""
+    status = {"error": error, "failed_at": failed_at}
+    _write_atomic(os.path.join(shared_dir, REFRESH_ERROR), lambda f: f.write(json.dumps(status).encode()))
+
+
+def _write_ipc(f, table):
+    with pa.ipc.new_file(f, table.schema) as writer:
+        writer.write_table(table)
+
+
+def read_shared_manifest(shared_dir):
+    try:
+        with open(os.path.join(shared_dir, SHARED_MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def attach_shared_sheet(shared_dir, name, entry):
+    """Maps one published tab: metadata from Arrow, KPI matrix zero-copy."""
+    with pa.memory_map(os.path.join(shared_dir, entry["meta"])) as source:
+        meta = pa.ipc.open_file(source).read_all().to_pandas()
+    values = np.load(os.path.join(shared_dir, entry["kpi"]), mmap_mode="r")
+    kpi = pd.DataFrame(values, columns=entry["kpi_cols"], copy=False)
+    return assemble_sheet(name, meta, kpi, snapshot_dir=entry.get("cold_dir"), columns=entry.get("columns"),
+                          version=entry["hash"])
+
+
+class SharedNetworkStore:
+    """NetworkDataStore front end for several worker processes on one host.
+
+    Whichever process takes the leader lock runs the wrapped store (the
+    only one that talks to Google Sheets) and publishes every version to
+    `shared_dir`. The others attach to the published files and poll for
+    new versions; if the leader exits, the next poll elects a new one.
+    """
+
+    def __init__(self, store, shared_dir, poll_interval=5):
+        self.store = store
+        self.shared_dir = shared_dir
+        self.poll_interval = poll_interval
+        self._lock_file = None
+        self._current = None
+        self._attempted = threading.Event()
+        store.on_update = lambda data: publish_models(data, shared_dir)
+        store.on_error = lambda error, failed_at: publish_refresh_error(shared_dir, error, failed_at)
+
+    @property
+    def is_leader(self):
+        return self._lock_file is not None
+
+    @property
+    def last_error(self):
+        """The leader's refresh error, if it failed after the version we serve."""
+        if self.is_leader:
+            return self.store.last_error
+        try:
+            with open(os.path.join(self.shared_dir, REFRESH_ERROR)) as f:
+                status = json.load(f)
+        except (OSError, ValueError):
+            return None
+        data = self._current
+        if data is not None and status["failed_at"] <= data.loaded_at:
+            return None  # a newer version was published since
+        return status["error"]
+
+    def start(self):
+        os.makedirs(self.shared_dir, exist_ok=True)
+        if not self._try_lead():
+            self._attach_latest()
+            threading.Thread(target=self._follow, name="network-data-follow", daemon=True).start()
+        return self
+
+    def current(self, timeout=None):
+        if self.is_leader:
+            return self.store.current(timeout)
+        self._attempted.wait(timeout)
+        data = self._current
+        if data is None:
+            raise RuntimeError("Waiting for the leader worker to publish the network sheets")
+        return data
+
+    def _try_lead(self):
+        import fcntl  # POSIX only, like /dev/shm
+
+        lock_file = open(os.path.join(self.shared_dir, LEADER_LOCK), "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file  # held for the life of the process
+        self.store.start()
+        return True
+
+    def _follow(self):
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                if self._try_lead():
+                    return
+                self._attach_latest()
+            except Exception:
+                logger.exception("Could not attach to the shared network data")
+
+    def _attach_latest(self):
+        manifest = read_shared_manifest(self.shared_dir)
+        if manifest is None:
+            return
+        versions = {name: entry["hash"] for name, entry in manifest["tabs"].items()}
+        previous = self._current
+        if previous is not None and previous.versions == versions:
+            # Same data, but the leader did refresh: keep its time and tab errors
+            if previous.loaded_at != manifest["loaded_at"]:
+                self._current = replace(previous, errors=manifest["errors"], loaded_at=manifest["loaded_at"])
+            return
+
+        loaders = {
+            name: partial(attach_shared_sheet, self.shared_dir, name, entry)
+            for name, entry in manifest["tabs"].items()
+        }
+        models = _build_models(loaders, versions, previous)
+        self._current = NetworkData({}, manifest["errors"], versions, models, manifest["loaded_at"])
+        self._attempted.set()
+
+
+# --- STAGE TIMINGS ---
+# Wall time of each pipeline stage per rerun (and per background refresh),
+# aggregated per process for the admin panel, structured logs and a
+# Prometheus text file (NETWORK_METRICS_FILE, e.g. for node_exporter's
+# textfile collector).
+METRICS_FILE = os.environ.get("NETWORK_METRICS_FILE", "")
+PERF_PANEL = os.environ.get("NETWORK_PERF_PANEL", "") not in ("", "0")
+TIMING_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+timing_logger = logging.getLogger(__name__ + ".timings")
+
+
+class StageTimer:
+    """Collects the stage durations of one run ("rerun" or "refresh").
+
+        with timer.stage("filter"):
+            ...
+    """
+
+    def __init__(self, kind="rerun"):
+        self.kind = kind
+        self.stages = {}
+        self.started = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    def total(self):
+        return time.perf_counter() - self.started
+
+
+class StageMetrics:
+    """Per-process timing histograms, one per (kind, stage).
+
+    Keep one per process (st.cache_resource). Every recorded run is also
+    logged as one JSON line on the "network_data.timings" logger.
+    """
+
+    def __init__(self, recent=200, metrics_file=METRICS_FILE, write_interval=15):
+        self.metrics_file = metrics_file
+        self.write_interval = write_interval
+        self._recent = recent
+        self._lock = threading.Lock()
+        self._stats = {}    # (kind, stage) -> [count, sum, max, bucket counts]
+        self._samples = {}  # (kind, stage) -> recent durations, for percentiles
+        self._written_at = 0.0
+
+    def record(self, timer):
+        stages = dict(timer.stages, total=timer.total())
+        with self._lock:
+            for stage, seconds in stages.items():
+                key = (timer.kind, stage)
+                stats = self._stats.get(key)
+                if stats is None:
+                    stats = self._stats[key] = [0, 0.0, 0.0, [0] * len(TIMING_BUCKETS)]
+                    self._samples[key] = deque(maxlen=self._recent)
+                stats[0] += 1
+                stats[1] += seconds
+                stats[2] = max(stats[2], seconds)
+                for i, bound in enumerate(TIMING_BUCKETS):
+                    if seconds <= bound:
+                        stats[3][i] += 1
+                self._samples[key].append(seconds)
+
+        timing_logger.info(json.dumps({
+            "event": "stage_timings",
+            "kind": timer.kind,
+            "ms": {stage: round(seconds * 1000, 2) for stage, seconds in stages.items()},
+        }))
+        if self.metrics_file and time.time() - self._written_at >= self.write_interval:
+            self._written_at = time.time()
+            try:
+                text = self.prometheus_text()
+                _write_atomic(self.metrics_file, lambda f: f.write(text.encode()))
+            except OSError as e:
+                logger.warning("Could not write metrics file: %s", e)
+
+    def summary(self, kind="rerun"):
+        """Rows of stage, count, p50/p95/max in ms over the recent runs."""
+        rows = []
+        with self._lock:
+            for (run_kind, stage), stats in self._stats.items():
+                if run_kind != kind:
+                    continue
+                recent = np.fromiter(self._samples[(run_kind, stage)], dtype=float) * 1000
+                rows.append({
+                    "stage": stage,
+                    "runs": stats[0],
+                    "p50 ms": round(float(np.percentile(recent, 50)), 1),
+                    "p95 ms": round(float(np.percentile(recent, 95)), 1),
+                    "max ms": round(stats[2] * 1000, 1),
+                })
+        return rows
+
+    def prometheus_text(self):
+        """All histograms in the Prometheus text exposition format."""
+        name = "network_dashboard_stage_seconds"
+        lines = [
+            f"# HELP {name} Wall time of dashboard pipeline stages.",
+            f"# TYPE {name} histogram",
+        ]
+        with self._lock:
+            for (kind, stage), (count, total, _, buckets) in sorted(self._stats.items()):
+                labels = f'kind="{kind}",stage="{stage}"'
+                for bound, bucket_count in zip(TIMING_BUCKETS, buckets):
+                    lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {bucket_count}')
+                lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {count}')
+                lines.append(f"{name}_sum{{{labels}}} {total:.6f}")
+                lines.append(f"{name}_count{{{labels}}} {count}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,162 @@
+"""Synthetic network dataset generator for scale and load testing.
+
+Writes SITE_AVAIL, AVAILABILITY, 2G, 3G and 4G tabs with the same column
+conventions as the live sheet, ready for the offline source
+(NETWORK_DATA_DIR):
+
+    python synthetic_data.py --sites 50000 --days 365 --missing-rate 0.02 --out exports
+    NETWORK_DATA_DIR=exports streamlit run app10.py
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+REGIONS = ["CENTRAL", "NORTH", "SOUTH", "EAST", "WEST", "NORTH-EAST", "SOUTH-WEST", "METRO"]
+TGLS_PER_REGION = 6
+REVENUE_CATS = ["PLATINUM", "GOLD", "SILVER", "BRONZE"]
+SITE_CATEGORIES = ["MACRO", "MICRO", "IBS", "SMALL CELL"]
+SITE_IMPORTANCE = ["CRITICAL", "HIGH", "MEDIUM", "LOW"]
+SHARING_STATUS = ["NON-SHARED", "SHARED-HOST", "SHARED-GUEST"]
+
+# Share of sites that carry each technology (every site has 2G)
+TECH_COVERAGE = {"2G": 1.0, "3G": 0.85, "4G": 0.7}
+
+
+def site_metadata(rng, sites, missing_rate=0.0):
+    """The descriptive columns shared by every tab, one row per site."""
+    region = rng.integers(0, len(REGIONS), sites)
+    tgl = region * TGLS_PER_REGION + rng.integers(0, TGLS_PER_REGION, sites)
+    on_air = pd.Timestamp("2005-01-01") + pd.to_timedelta(rng.integers(0, 7000, sites), unit="D")
+
+    meta = pd.DataFrame({
+        "SID": [f"SID{i:06d}" for i in range(sites)],
+        "REGION": np.array(REGIONS)[region],
+        "TGL": [f"TGL-{t:03d}" for t in tgl],
+        "NEW USF SITES": np.where(rng.random(sites) < 0.12, "USF", None),
+        "REVENUE CAT": rng.choice(REVENUE_CATS, sites, p=[0.1, 0.25, 0.35, 0.3]),
+        "SITE CATEGORY": rng.choice(SITE_CATEGORIES, sites, p=[0.7, 0.15, 0.1, 0.05]),
+        "SITE IMPORTANCE": rng.choice(SITE_IMPORTANCE, sites, p=[0.05, 0.2, 0.45, 0.3]),
+        "SHARING STATUS": rng.choice(SHARING_STATUS, sites, p=[0.6, 0.25, 0.15]),
+        "ONAIRDATE": on_air.strftime("%Y-%m-%d"),
+        "LATITUDE": (24 + rng.random(sites) * 12).round(6),
+        "LONGITUDE": (61 + rng.random(sites) * 14).round(6),
+    })
+    # Coordinates are the detail most often blank in the real sheet
+    for col in ["LATITUDE", "LONGITUDE"]:
+        meta.loc[rng.random(sites) < missing_rate, col] = np.nan
+    return meta
+
+
+def site_availability(rng, sites, days):
+    """Daily site availability (%): mostly ~99.9 with occasional outages.
+
+    Each site gets its own outage rate, so a few sites are chronically bad
+    and most are near-perfect, like the live network.
+    """
+    outage_rate = rng.beta(0.6, 60, sites).astype(np.float32)[:, None]
+    avail = 100 - rng.exponential(0.15, (sites, days)).astype(np.float32)
+    outage = rng.random((sites, days), dtype=np.float32) < outage_rate
+    avail[outage] = rng.uniform(0, 95, outage.sum()).astype(np.float32)
+    return np.clip(avail, 0, 100)
+
+
+def cell_availability(rng, site_avail):
+    """Cell availability of one technology: tracks its site, slightly lower."""
+    loss = rng.exponential(0.3, site_avail.shape).astype(np.float32)
+    return np.clip(site_avail - loss, 0, 100)
+
+
+def kpi_frame(meta, rows, dates, daily, missing_rate, rng, fuel=False):
+    """Assembles one tab: metadata + date columns + monthly TCH% (+ FUEL)."""
+    daily = daily.copy()
+    daily[rng.random(daily.shape, dtype=np.float32) < missing_rate] = np.nan
+
+    months = dates.to_period("M")
+    monthly = {}
+    # "<MON> TCH%" has no year, so only the latest 12 months get columns
+    for period in months.unique()[-12:]:
+        name = period.strftime("%b").upper()
+        in_month = daily[:, np.asarray(months == period)]
+        with np.errstate(invalid="ignore"):
+            tch = np.nanmean(in_month, axis=1) - rng.exponential(0.2, len(rows))
+        monthly[f"{name} TCH%"] = np.clip(tch, 0, 100).round(2)
+        if fuel:
+            # Litres of generator fuel: more outage hours, more fuel burnt
+            outage_hours = np.nansum(100 - in_month, axis=1) * 0.24
+            monthly[f"{name} (FUEL)"] = (outage_hours * rng.uniform(2, 4, len(rows))).round(1)
+
+    kpi = pd.DataFrame(daily.round(2), columns=dates.strftime("%Y-%m-%d"))
+    for col, values in monthly.items():
+        values[rng.random(len(values)) < missing_rate] = np.nan
+        kpi[col] = values
+    return pd.concat([meta.iloc[rows].reset_index(drop=True), kpi], axis=1)
+
+
+def iter_network_tabs(sites=1000, days=90, missing_rate=0.02, end=None, seed=0):
+    """Yields (tab name, DataFrame) one tab at a time to bound peak memory."""
+    rng = np.random.default_rng(seed)
+    end = pd.Timestamp(end) if end else pd.Timestamp.today().normalize() - pd.Timedelta(days=1)
+    dates = pd.date_range(end=end, periods=days)
+
+    meta = site_metadata(rng, sites, missing_rate)
+    site_avail = site_availability(rng, sites, days)
+    all_rows = np.arange(sites)
+    yield "SITE_AVAIL", kpi_frame(meta, all_rows, dates, site_avail, missing_rate, rng, fuel=True)
+
+    # AVAILABILITY is the mean over the technologies each site carries
+    total = np.zeros_like(site_avail)
+    count = np.zeros(sites, dtype=np.float32)
+    for tech, coverage in TECH_COVERAGE.items():
+        rows = all_rows if coverage >= 1 else np.flatnonzero(rng.random(sites) < coverage)
+        cells = cell_availability(rng, site_avail[rows])
+        total[rows] += cells
+        count[rows] += 1
+        yield tech, kpi_frame(meta, rows, dates, cells, missing_rate, rng)
+    del site_avail
+
+    yield "AVAILABILITY", kpi_frame(meta, all_rows, dates, total / count[:, None], missing_rate, rng, fuel=True)
+
+
+def generate_network_data(sites=1000, days=90, missing_rate=0.02, end=None, seed=0):
+    """All five tabs as {tab name: DataFrame}, like fetch_sheets returns."""
+    return dict(iter_network_tabs(sites, days, missing_rate, end, seed))
+
+
+def write_tab(df, path):
+    """Writes one tab in the format given by the file extension."""
+    ext = os.path.splitext(path)[1]
+    if ext == ".parquet":
+        df.to_parquet(path, index=False)
+    elif ext == ".csv":
+        df.to_csv(path, index=False)
+    elif ext == ".xlsx":
+        df.to_excel(path, index=False)
+    else:
+        raise ValueError(f"Unsupported format: {ext}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sites", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--missing-rate", type=float, default=0.02, help="share of blank KPI cells")
+    parser.add_argument("--end", default=None, help="last date column (default: yesterday)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--format", choices=["parquet", "csv", "xlsx"], default="parquet")
+    parser.add_argument("--out", default="exports", help="output directory")
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    for name, df in iter_network_tabs(args.sites, args.days, args.missing_rate, args.end, args.seed):
+        path = os.path.join(args.out, f"{name}.{args.format}")
+        start = time.perf_counter()
+        write_tab(df, path)
+        print(f"{name:<13} {len(df):>7} rows x {df.shape[1]:>4} cols -> {path} "
+              f"({time.perf_counter() - start:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()